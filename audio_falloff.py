@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# --- Configuration ---
+# Matches the audio source settings explored in 'audio falloff.ipynb'.
+MIN_DISTANCE = 0.75  # volume = 1 at or inside this distance
+MAX_DISTANCE = 23    # volume = 0 at or beyond this distance (log curve only)
+ROLLOFF_FACTOR = 2
+
+DEFAULT_RESOLUTION = 256
+# Dense sampling used to measure how far a baked table strays from the exact curve.
+ERROR_SAMPLES = 100_000
+
+
+def log_volume(distance, min_distance=MIN_DISTANCE, max_distance=MAX_DISTANCE):
+    """
+    Logarithmic falloff from 1 at min_distance to 0 at max_distance, vectorized:
+    1 - ln(d / min) / ln(max / min).
+
+    This is the curve the notebook's `unity_volume` was after. Its formula,
+    1 / (1 + log2((d - min) / max)), isn't reproduced literally: its denominator is negative
+    while d - min < max / 2, so the volume is negative there, blows up at d - min = max / 2,
+    and stays above 1 from there out to max_distance.
+    """
+    distance = np.asarray(distance, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume = 1.0 - np.log(distance / min_distance) / np.log(max_distance / min_distance)
+    volume = np.where(distance <= min_distance, 1.0, volume)
+    return np.where(distance >= max_distance, 0.0, volume)
+
+
+def rolloff_volume(distance, min_distance=MIN_DISTANCE, rolloff_factor=ROLLOFF_FACTOR):
+    """The notebook's logarithmic rolloff, vectorized: 1 / (1 + rolloff * ln(d / min)); 1 inside min_distance."""
+    distance = np.asarray(distance, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume = 1.0 / (1.0 + rolloff_factor * np.log(distance / min_distance))
+    return np.where(distance <= min_distance, 1.0, volume)
+
+
+def inverse_volume(distance, min_distance=MIN_DISTANCE):
+    """The notebook's inverse curve, vectorized: 1 / (1 + (d - min)); 1 inside min_distance."""
+    distance = np.asarray(distance, dtype=np.float64)
+    return np.where(distance <= min_distance, 1.0, 1.0 / (1.0 + np.maximum(distance - min_distance, 0.0)))
+
+
+CURVES = {
+    'log': log_volume,
+    'rolloff': rolloff_volume,
+    'inverse': inverse_volume,
+}
+
+
+def bake_lut(curve, resolution=DEFAULT_RESOLUTION, max_distance=MAX_DISTANCE):
+    """Samples a curve at `resolution` evenly spaced distances over [0, max_distance]."""
+    distances = np.linspace(0.0, max_distance, resolution)
+    return curve(distances).astype(np.float32)
+
+
+def sample_lut(lut, distance, max_distance=MAX_DISTANCE):
+    """Linearly interpolates a baked table the way the game would; distances past the end clamp to the last entry."""
+    distances = np.linspace(0.0, max_distance, len(lut))
+    return np.interp(distance, distances, lut)
+
+
+def lut_error(curve, lut, max_distance=MAX_DISTANCE, samples=ERROR_SAMPLES):
+    """Returns (max, mean) absolute interpolation error of a baked table against the exact curve."""
+    distances = np.linspace(0.0, max_distance, samples)
+    error = np.abs(sample_lut(lut, distances, max_distance) - curve(distances))
+    return float(error.max()), float(error.mean())
+
+
+def export_lut(path, curve_name, lut, min_distance=MIN_DISTANCE, max_distance=MAX_DISTANCE):
+    """
+    Writes a baked table. '.json' files hold the table plus its sampling parameters;
+    anything else is written as raw little-endian float32 (a Unity TextAsset .bytes file).
+    """
+    path = Path(path)
+    if path.suffix == '.json':
+        path.write_text(json.dumps({
+            'curve': curve_name,
+            'minDistance': min_distance,
+            'maxDistance': max_distance,
+            'resolution': len(lut),
+            'step': max_distance / (len(lut) - 1),
+            'values': [round(float(v), 6) for v in lut],
+        }))
+    else:
+        path.write_bytes(lut.astype('<f4').tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake audio falloff curves into lookup tables and report their interpolation error.")
+    parser.add_argument('--curve', choices=sorted(CURVES), default='log', help="Falloff curve to bake. Default is log.")
+    parser.add_argument('--resolution', type=int, default=DEFAULT_RESOLUTION, help=f"Number of table entries. Default is {DEFAULT_RESOLUTION}.")
+    parser.add_argument('--min-distance', type=float, default=MIN_DISTANCE, help=f"Distance inside which volume is 1. Default is {MIN_DISTANCE}.")
+    parser.add_argument('--max-distance', type=float, default=MAX_DISTANCE, help=f"Distance where the log curve reaches 0; also the range the table covers. Default is {MAX_DISTANCE}.")
+    parser.add_argument('--output', metavar='PATH', help="Write the table to PATH (.json, or raw float32 for any other extension).")
+    args = parser.parse_args()
+
+    if args.resolution < 2:
+        print("Error: --resolution must be at least 2.")
+        sys.exit(1)
+
+    if not 0 < args.min_distance < args.max_distance:
+        print("Error: distances must satisfy 0 < --min-distance < --max-distance.")
+        sys.exit(1)
+
+    if args.curve == 'log':
+        curve = lambda d: log_volume(d, args.min_distance, args.max_distance)
+    else:
+        curve = lambda d: CURVES[args.curve](d, args.min_distance)
+    lut = bake_lut(curve, args.resolution, args.max_distance)
+    max_error, mean_error = lut_error(curve, lut, args.max_distance)
+    print(f"Baked '{args.curve}' falloff: {args.resolution} entries over [0, {args.max_distance}]")
+    print(f"  Interpolation error vs exact curve: max {max_error:.6f}, mean {mean_error:.6f}")
+
+    if args.output:
+        export_lut(args.output, args.curve, lut, args.min_distance, args.max_distance)
+        print(f"Saved lookup table to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+import warnings
+from pathlib import Path
+
+from skin_catalog import load_config, open_catalog
+
+# numpy, PIL and spritesheet are imported by the functions that fit and write offsets, so
+# --help (e.g. through djtools.py) starts without loading them.
+
+# --- Configuration ---
+# Torso sheets and the metadata files holding their head offsets.
+TORSO_SHEETS = {
+    'Torso.png': 'TorsoSpriteData.xml',
+    'pistol.png': 'pistolSpriteData.xml',
+    'smg.png': 'smgSpriteData.xml',
+    'rifle.png': 'rifleSpriteData.xml',
+    'shotgun.png': 'shotgunSpriteData.xml',
+}
+LEG_SHEET = ('Legs.png', 'LegSpriteData.xml')
+
+SPRITE_SIZE = (64, 64)
+
+# Same head placement as Spritesheet.add_sprites: XML (x, y) puts the head's top-left at (16 + x, 16 - y).
+HEAD_CENTER_OFFSET = 16
+
+# Rows below the top of the silhouette averaged to find the neck (torso) or waist (legs) column.
+ANCHOR_BAND_ROWS = 3
+
+# A cell index needs this many skins with that cell before its own consensus is trusted;
+# otherwise the sheet-wide consensus is used.
+MIN_SKINS_FOR_CELL_CONSENSUS = 3
+
+DEFAULT_TOLERANCE = 1
+
+
+def top_anchors(alpha, band_rows=ANCHOR_BAND_ROWS):
+    """
+    Finds the top of every cell's silhouette at once. `alpha` is an (N, h, w) boolean mask.
+    Returns (x, y) float arrays, NaN for empty cells: y is the topmost opaque row and x the
+    mean column of the opaque pixels in the `band_rows` rows starting there.
+    """
+    import numpy as np
+
+    rows = alpha.any(axis=2)
+    top = rows.argmax(axis=1)
+    band = (np.arange(alpha.shape[1]) >= top[:, None]) & (np.arange(alpha.shape[1]) < top[:, None] + band_rows)
+    weights = alpha & band[:, :, None]
+    counts = weights.sum(axis=(1, 2))
+    x = (weights.sum(axis=1) * np.arange(alpha.shape[2])).sum(axis=1) / np.maximum(counts, 1)
+    empty = ~rows.any(axis=1)
+    return np.where(empty, np.nan, x), np.where(empty, np.nan, top.astype(float))
+
+
+def atlas_anchors(path):
+    """Top anchors for every cell of a sheet, from its alpha channel."""
+    from PIL import Image
+    from spritesheet import slice_atlas
+
+    alpha = slice_atlas(Image.open(path), SPRITE_SIZE)[..., 3] > 0
+    return top_anchors(alpha)
+
+
+def consensus(deltas):
+    """
+    Given (skins, cells, 2) anchor-to-offset deltas with NaN gaps, returns the expected delta
+    per cell: the median across skins where enough skins have the cell, else the sheet median.
+    """
+    import numpy as np
+
+    with warnings.catch_warnings():
+        # All-NaN cells (empty in every skin) just stay NaN.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        per_cell = np.nanmedian(deltas, axis=0)
+        sheet_wide = np.nanmedian(deltas.reshape(-1, 2), axis=0)
+    support = (~np.isnan(deltas[..., 0])).sum(axis=0)
+    return np.where((support >= MIN_SKINS_FOR_CELL_CONSENSUS)[:, None], per_cell, sheet_wide)
+
+
+def padded(arrays, fill=float('nan')):
+    """Stacks ragged (cells, 2) arrays into one (len(arrays), max cells, 2) array."""
+    import numpy as np
+
+    cells = max((len(a) for a in arrays), default=0)
+    out = np.full((len(arrays), cells, 2), fill)
+    for i, a in enumerate(arrays):
+        out[i, :len(a)] = a
+    return out
+
+
+def fit_sheet(skin_dirs, sheet_name, metadata_name, is_legs):
+    """
+    Proposes offsets for one sheet type across every skin. Each frame's offset is expressed
+    relative to its anchor (neck for torsos, waist for legs); the consensus of that relation
+    across skins is then applied back to every frame's anchor. Returns
+    {skin: [(cell, current Point, proposed Point), ...]} for every skin that has the sheet.
+    """
+    import numpy as np
+    from spritesheet import Point, load_leg_metadata_at_path, load_metadata_at_path
+
+    skins, anchors, offsets, metadata = [], [], [], {}
+    for skin_name, skin_dir in sorted(skin_dirs.items()):
+        sheet_path, metadata_path = Path(skin_dir) / sheet_name, Path(skin_dir) / metadata_name
+        if not sheet_path.is_file() or not metadata_path.is_file():
+            continue
+        x, y = atlas_anchors(sheet_path)
+        metadata_list = load_leg_metadata_at_path(metadata_path) if is_legs else load_metadata_at_path(metadata_path)
+        cells = min(len(x), len(metadata_list))
+        points = [m.torso_offset if is_legs else m.head_offset for m in metadata_list[:cells]]
+        skins.append(skin_name)
+        anchors.append(np.stack([x[:cells], y[:cells]], axis=1))
+        offsets.append(np.array([(p.x, p.y) for p in points], dtype=float).reshape(-1, 2))
+        metadata[skin_name] = points
+    if not skins:
+        return {}
+
+    anchors, offsets = padded(anchors), padded(offsets)
+    if is_legs:
+        # The torso is pasted at (x, -y) on the legs' canvas.
+        placement = np.stack([offsets[..., 0], -offsets[..., 1]], axis=-1)
+    else:
+        # The head's top-left in torso pixels.
+        placement = np.stack([HEAD_CENTER_OFFSET + offsets[..., 0], HEAD_CENTER_OFFSET - offsets[..., 1]], axis=-1)
+    expected = anchors + consensus(placement - anchors)[None]
+    if is_legs:
+        proposed = np.stack([expected[..., 0], -expected[..., 1]], axis=-1)
+    else:
+        proposed = np.stack([expected[..., 0] - HEAD_CENTER_OFFSET, HEAD_CENTER_OFFSET - expected[..., 1]], axis=-1)
+
+    fits = {}
+    for i, skin_name in enumerate(skins):
+        fits[skin_name] = [
+            (cell, current, Point(int(round(proposed[i, cell, 0])), int(round(proposed[i, cell, 1]))))
+            for cell, current in enumerate(metadata[skin_name])
+            if not np.isnan(proposed[i, cell, 0])
+        ]
+    return fits
+
+
+def propose_corrections(skin_dirs, tolerance=DEFAULT_TOLERANCE):
+    """
+    Fits every torso and leg sheet of every skin in one batch. Returns
+    {skin: {metadata file: [(cell, current Point, proposed Point), ...]}} listing only the frames
+    whose proposal is at least `tolerance` pixels from the current offset on either axis.
+    """
+    sheets = [(name, metadata_name, False) for name, metadata_name in TORSO_SHEETS.items()] + [LEG_SHEET + (True,)]
+    corrections = {}
+    for sheet_name, metadata_name, is_legs in sheets:
+        for skin_name, fits in fit_sheet(skin_dirs, sheet_name, metadata_name, is_legs).items():
+            changed = [(cell, current, proposed) for cell, current, proposed in fits
+                       if abs(proposed.x - current.x) >= tolerance or abs(proposed.y - current.y) >= tolerance]
+            if changed:
+                corrections.setdefault(skin_name, {})[metadata_name] = changed
+    return corrections
+
+
+def apply_corrections(skin_dirs, corrections):
+    """Writes proposed offsets back through save_metadata_at_path / save_leg_metadata_at_path."""
+    from spritesheet import load_leg_metadata_at_path, load_metadata_at_path, save_leg_metadata_at_path, save_metadata_at_path
+
+    for skin_name, files in corrections.items():
+        for metadata_name, changes in files.items():
+            path = Path(skin_dirs[skin_name]) / metadata_name
+            if metadata_name == LEG_SHEET[1]:
+                metadata_list = load_leg_metadata_at_path(path)
+                for cell, _, proposed in changes:
+                    metadata_list[cell].torso_offset = proposed
+                save_leg_metadata_at_path(path, metadata_list)
+            else:
+                metadata_list = load_metadata_at_path(path)
+                for cell, _, proposed in changes:
+                    metadata_list[cell].head_offset = proposed
+                save_metadata_at_path(path, metadata_list)
+            print(f"Updated {len(changes)} offsets in '{path}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose head and torso offsets from the sprites' alpha masks, for every skin at once.")
+    parser.add_argument('skins', nargs='*', metavar='SKIN', help="Skins to correct. All skins are still used to build the consensus. Default is every skin.")
+    parser.add_argument('--tolerance', type=int, default=DEFAULT_TOLERANCE, help=f"Minimum difference in pixels worth reporting. Default is {DEFAULT_TOLERANCE}.")
+    parser.add_argument('--json', metavar='PATH', help="Write the proposals as JSON to PATH.")
+    parser.add_argument('--write', action='store_true', help="Save the proposed offsets into the skins' metadata XML files.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    skin_dirs = open_catalog(config).skin_dirs()
+    for skin_name in args.skins:
+        if skin_name not in skin_dirs:
+            print(f"Error: Unknown skin '{skin_name}'.")
+            sys.exit(1)
+
+    corrections = propose_corrections(skin_dirs, args.tolerance)
+    if args.skins:
+        corrections = {name: files for name, files in corrections.items() if name in args.skins}
+
+    for skin_name, files in corrections.items():
+        print(f"{skin_name}:")
+        for metadata_name, changes in files.items():
+            print(f"  {metadata_name}: {len(changes)} frames")
+            for cell, current, proposed in changes:
+                print(f"    {cell:>4}: ({current.x}, {current.y}) -> ({proposed.x}, {proposed.y})")
+    print(f"\n{sum(len(c) for files in corrections.values() for c in files.values())} offsets to correct across {len(corrections)} skins.")
+
+    if args.json:
+        report = {name: {metadata_name: [{'cell': cell, 'current': [c.x, c.y], 'proposed': [p.x, p.y]} for cell, c, p in changes]
+                         for metadata_name, changes in files.items()} for name, files in corrections.items()}
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Saved proposals to '{args.json}'")
+
+    if args.write:
+        apply_corrections(skin_dirs, corrections)
+
+
+if __name__ == '__main__':
+    main()
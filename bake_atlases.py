@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import os
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from buildcache import BuildCache
+from indexes import Direction
+from skin_catalog import load_config, open_catalog
+
+# PIL, preview and spritesheet are imported by the functions that composite and hash, so
+# --help doesn't load them; worker processes import them once on their first combo.
+
+# --- Configuration ---
+DEFAULT_OUTPUT_DIRECTORY = 'baked_atlases'
+ATLAS_BUILD_CACHE_FILENAME = '.atlas_build_cache.json'
+
+# Weapon animations hold a still leg frame; bake one variant per stance.
+WEAPON_LEG_STANCES = ('idle', 'crouch')
+
+# Bumped when the atlas or frame table layout changes, so every atlas is rebaked.
+ATLAS_FORMAT_VERSION = 1
+
+# Source files whose contents affect every baked atlas.
+BAKER_SOURCE_PATHS = [Path(__file__).parent / name for name in ('indexes.py', 'spritesheet.py', 'preview.py', 'bake_atlases.py')]
+
+
+def atlas_animations():
+    """Yields (name, torso_type, frames) for every animation, direction and leg stance the index tables define."""
+    from preview import LEG_ANIMATIONS, PREVIEW_ANIMATIONS, animation_frames
+
+    for torso_type, animations in PREVIEW_ANIMATIONS.items():
+        for animation in animations:
+            stances = (None,) if torso_type == 'unarmed' or animation in LEG_ANIMATIONS else WEAPON_LEG_STANCES
+            for direction in Direction:
+                for stance in stances:
+                    frames = animation_frames(torso_type, animation, direction, stance or 'idle')
+                    if frames:
+                        yield '/'.join(filter(None, (torso_type, animation, direction.name, stance))), torso_type, frames
+
+
+def atlas_name(combo):
+    return '_'.join(combo)
+
+
+def atlas_outputs(output_dir, combo):
+    """The two files baked for a combo: its atlas PNG and its frame table."""
+    return output_dir / f'{atlas_name(combo)}_atlas.png', output_dir / f'{atlas_name(combo)}_frames.json'
+
+
+def bake_combo(skin_dirs, combo, output_dir):
+    """
+    Composites every animation frame of one (legs, torso, head) combo into a single atlas and
+    writes '{combo}_atlas.png' plus a '{combo}_frames.json' frame table to output_dir.
+    Pixel-identical frames share one atlas cell. Returns (combo, cell count, frame count).
+    """
+    from PIL import Image
+    from preview import FRAME_DURATION_MS
+    from spritesheet import Spritesheet
+
+    legs, torso, head = combo
+    sheet = Spritesheet(skin_dirs[legs], skin_dirs[torso], head, dedup=True)
+
+    sprites = []
+    cell_by_sprite = {}  # id(composite) -> cell; dedup returns the same object for identical frames
+    animations = {}
+    for name, torso_type, frames in atlas_animations():
+        try:
+            composites = [sheet.create_stacked_sprite(*frame, torso_type=torso_type) for frame in frames]
+        except (AttributeError, IndexError) as e:
+            print(f"Warning: Skipping {atlas_name(combo)} {name}: {e}")
+            continue
+        for sprite in composites:
+            if id(sprite) not in cell_by_sprite:
+                cell_by_sprite[id(sprite)] = len(sprites)
+                sprites.append(sprite)
+        animations[name] = [cell_by_sprite[id(sprite)] for sprite in composites]
+    if not sprites:
+        raise ValueError(f"No frames could be composited for {atlas_name(combo)}.")
+
+    cell_w = max(sprite.width for sprite in sprites)
+    cell_h = max(sprite.height for sprite in sprites)
+    columns = math.ceil(math.sqrt(len(sprites) * cell_h / cell_w))
+    rows = math.ceil(len(sprites) / columns)
+    atlas = Image.new("RGBA", (columns * cell_w, rows * cell_h), (0, 0, 0, 0))
+    cells = []
+    for i, sprite in enumerate(sprites):
+        x, y = (i % columns) * cell_w, (i // columns) * cell_h
+        atlas.paste(sprite if sprite.mode == "RGBA" else sprite.convert("RGBA"), (x, y))
+        cells.append([x, y, sprite.width, sprite.height])
+
+    atlas_path, table_path = atlas_outputs(output_dir, combo)
+    atlas.save(atlas_path)
+    table = {
+        'version': ATLAS_FORMAT_VERSION,
+        'atlas': atlas_path.name,
+        'combo': {'legs': legs, 'torso': torso, 'head': head},
+        # Every cell's top-left is the legs sprite's top-left, so frames share one pivot.
+        'cells': cells,
+        'frame_duration_ms': FRAME_DURATION_MS,
+        'animations': animations,
+    }
+    table_path.write_text(json.dumps(table, indent=1))
+    return combo, len(sprites), sum(len(frames) for frames in animations.values())
+
+
+def atlas_signature(cache, skin_dirs, combo):
+    from spritesheet import spritesheet_input_paths
+
+    legs, torso, head = combo
+    input_paths = spritesheet_input_paths(skin_dirs[legs], skin_dirs[torso], head)
+    return cache.signature(list(dict.fromkeys(input_paths.values())) + BAKER_SOURCE_PATHS, {'version': ATLAS_FORMAT_VERSION})
+
+
+def bake_atlases(skin_dirs, combos, output_dir, jobs=None, force=False):
+    """
+    Bakes every out-of-date combo in parallel worker processes; combos whose sheets, metadata
+    and baker code are unchanged since their last bake are skipped. Returns the combos baked.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = BuildCache(output_dir / ATLAS_BUILD_CACHE_FILENAME)
+    if force:
+        cache.outputs = {}
+
+    signatures = {combo: atlas_signature(cache, skin_dirs, combo) for combo in combos}
+    # Both files are checked, so a deleted atlas is rebaked even when its frame table is still there.
+    stale = [combo for combo in combos if any(cache.is_stale(path, signatures[combo]) for path in atlas_outputs(output_dir, combo))]
+    print(f"{len(stale)} of {len(combos)} atlases out of date.")
+
+    baked = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(bake_combo, skin_dirs, combo, output_dir): combo for combo in stale}
+        for future in as_completed(futures):
+            combo = futures[future]
+            try:
+                _, cell_count, frame_count = future.result()
+            except (OSError, ValueError, ET.ParseError, AttributeError, IndexError) as e:
+                # The errors Spritesheet raises for unreadable sheets and metadata.
+                print(f"Error: Could not bake {atlas_name(combo)}: {e}")
+                continue
+            for path in atlas_outputs(output_dir, combo):
+                cache.record(path, signatures[combo])
+            baked.append(combo)
+            print(f"Baked {atlas_name(combo)}: {frame_count} frames in {cell_count} cells.")
+    cache.save()
+    return baked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-composite every animation frame of NPC (legs, torso, head) combos into atlases with frame tables.")
+    parser.add_argument('--combo', nargs=3, action='append', default=[], metavar=('LEGS', 'TORSO', 'HEAD'), help="A combo to bake. Can be given multiple times.")
+    parser.add_argument('--combos', metavar='COMBOS_JSON', help="A JSON list of [legs, torso, head] combos to bake.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIRECTORY, help=f"Output directory. Default is '{DEFAULT_OUTPUT_DIRECTORY}'.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="Worker processes. Default is one per CPU.")
+    parser.add_argument('--force', action='store_true', help="Rebake every combo, ignoring the build cache.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    combos = [tuple(combo) for combo in args.combo]
+    if args.combos:
+        try:
+            combos += [tuple(combo) for combo in json.loads(Path(args.combos).read_text())]
+        except (OSError, ValueError) as e:
+            print(f"Error reading combos '{args.combos}': {e}")
+            sys.exit(1)
+    if not combos:
+        parser.error("Give at least one --combo or a --combos file.")
+
+    skin_dirs = open_catalog(config).skin_dirs()
+    for combo in combos:
+        unknown = [name for name in combo if name not in skin_dirs]
+        if len(combo) != 3 or unknown:
+            print(f"Error: Invalid combo {list(combo)}: expected [legs, torso, head] skin names{f', unknown {unknown}' if unknown else ''}.")
+            sys.exit(1)
+
+    bake_atlases(skin_dirs, list(dict.fromkeys(combos)), args.output, args.jobs, args.force)
+
+
+if __name__ == '__main__':
+    main()
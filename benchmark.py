@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import PIL
+from PIL import Image, ImageDraw
+
+import spritesheet
+from spritesheet import (
+    LegSpriteMetadata, Point, Spritesheet, SpriteMetadata,
+    save_leg_metadata_at_path, save_metadata_at_path,
+)
+from recolor_tool import RECOLOR_DARK, analyze_palette, parse_hex_color, replace_colors
+
+# sprite-diagnostic.py has a hyphen in its name, so it has to be loaded by path.
+_diagnostic_spec = importlib.util.spec_from_file_location('sprite_diagnostic', Path(__file__).parent / 'sprite-diagnostic.py')
+sprite_diagnostic = importlib.util.module_from_spec(_diagnostic_spec)
+_diagnostic_spec.loader.exec_module(sprite_diagnostic)
+
+# --- Synthetic skin layout ---
+# Cell counts cover every index referenced by indexes.py for each sheet.
+SHEET_COLUMNS = 10
+SHEET_CELL_COUNTS = {
+    'Legs.png': 94,
+    'Torso.png': 94,
+    'pistol.png': 74,
+    'smg.png': 70,
+    'rifle.png': 70,
+    'shotgun.png': 70,
+}
+METADATA_FILES = {
+    'TorsoSpriteData.xml': 'Torso.png',
+    'pistolSpriteData.xml': 'pistol.png',
+    'smgSpriteData.xml': 'smg.png',
+    'rifleSpriteData.xml': 'rifle.png',
+    'shotgunSpriteData.xml': 'shotgun.png',
+}
+HEAD_CELL_COUNT = 5
+
+# A small pixel-art palette that includes the light skintones recolor_tool targets.
+SYNTHETIC_PALETTE = [parse_hex_color(color) for color in RECOLOR_DARK] + [
+    (34, 32, 52), (69, 40, 60), (102, 57, 49), (143, 86, 59),
+    (63, 63, 116), (48, 96, 130), (91, 110, 225), (99, 155, 255),
+    (55, 148, 110), (106, 190, 48), (155, 173, 183), (132, 126, 135),
+]
+
+DEFAULT_SCALES = [1, 4, 16]
+DEFAULT_REPEAT = 3
+DEFAULT_OUTPUT = 'bench_results.json'
+
+
+def generate_sheet(rng, cell_count, sprite_size=(64, 64), columns=SHEET_COLUMNS):
+    """Draws a sheet of pixel-art-like cells: a few opaque blocks per cell on a transparent background."""
+    sprite_w, sprite_h = sprite_size
+    rows = -(-cell_count // columns)
+    sheet = Image.new("RGBA", (columns * sprite_w, rows * sprite_h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sheet)
+    for cell in range(cell_count):
+        left = (cell % columns) * sprite_w
+        top = (cell // columns) * sprite_h
+        for _ in range(rng.randint(3, 8)):
+            x0 = left + rng.randrange(sprite_w // 4, sprite_w // 2)
+            y0 = top + rng.randrange(sprite_h // 8, sprite_h // 2)
+            x1 = x0 + rng.randrange(2, sprite_w // 3)
+            y1 = y0 + rng.randrange(2, sprite_h // 3)
+            draw.rectangle([x0, y0, x1, y1], fill=rng.choice(SYNTHETIC_PALETTE) + (255,))
+    return sheet
+
+
+def generate_skin(skin_dir, head_dir, skin_name, rng):
+    """Writes one synthetic skin (six 64x64 sheets, a 32x32 head sheet and the *SpriteData.xml files)."""
+    skin_dir.mkdir(parents=True, exist_ok=True)
+    for filename, cell_count in SHEET_CELL_COUNTS.items():
+        generate_sheet(rng, cell_count).save(skin_dir / filename)
+    generate_sheet(rng, HEAD_CELL_COUNT, sprite_size=(32, 32), columns=HEAD_CELL_COUNT).save(head_dir / f'{skin_name}.png')
+
+    leg_metadata = [LegSpriteMetadata(torso_offset=Point(0, rng.randint(0, 2))) for _ in range(SHEET_CELL_COUNTS['Legs.png'])]
+    save_leg_metadata_at_path(skin_dir / 'LegSpriteData.xml', leg_metadata)
+    for filename, sheet_name in METADATA_FILES.items():
+        metadata = [SpriteMetadata(head_sprite=i % HEAD_CELL_COUNT, head_in_front_of_torso=rng.random() < 0.8)
+                    for i in range(SHEET_CELL_COUNTS[sheet_name])]
+        save_metadata_at_path(skin_dir / filename, metadata)
+
+
+def generate_library(root, skin_count, seed=0):
+    """Generates `skin_count` synthetic skins under root. Returns {skin_name: skin_dir} and the head directory."""
+    rng = random.Random(seed)
+    head_dir = root / 'head'
+    head_dir.mkdir(parents=True, exist_ok=True)
+    skins = {}
+    for i in range(skin_count):
+        skin_name = f'synthetic{i:03d}'
+        skins[skin_name] = root / skin_name
+        generate_skin(skins[skin_name], head_dir, skin_name, rng)
+    return skins, head_dir
+
+
+def time_call(func, repeat):
+    """Runs func `repeat` times and returns the wall-clock duration of each run in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run_benchmarks(root, scales, repeat, seed=0):
+    """Times each pipeline stage over libraries of increasing size. Returns a list of result dicts."""
+    results = []
+    color_map = {parse_hex_color(key): parse_hex_color(value) for key, value in RECOLOR_DARK.items()}
+    outputs = sprite_diagnostic.diagnostic_outputs()
+
+    for scale in scales:
+        skins, head_dir = generate_library(root / f'scale_{scale}', scale, seed)
+        spritesheet.HEAD_SPRITESHEET_DIRECTORY = str(head_dir)
+        sheet_paths = [skin_dir / filename for skin_dir in skins.values() for filename in SHEET_CELL_COUNTS]
+        head_paths = [head_dir / f'{skin_name}.png' for skin_name in skins]
+        metadata_paths = [skin_dir / filename for skin_dir in skins.values() for filename in METADATA_FILES]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            sheets = {name: Spritesheet(skin_dir, skin_dir, name) for name, skin_dir in skins.items()}
+            indexed_sheets = {name: Spritesheet(skin_dir, skin_dir, name, indexed=True) for name, skin_dir in skins.items()}
+        loader = next(iter(sheets.values()))
+        indexed_loader = next(iter(indexed_sheets.values()))
+
+        def load_sheets(sheet):
+            for path in sheet_paths:
+                sheet.load_spritesheet_at_path(path)
+            for path in head_paths:
+                sheet.load_spritesheet_at_path(path, sprite_size=(32, 32))
+
+        def composite_all(sheets_by_name):
+            return [
+                [sheet.create_stacked_sprite(leg_index, torso_index, head_index, torso_type=output[0])
+                 for _, _, leg_index, torso_index, head_index in sprite_diagnostic.output_frames(output)]
+                for sheet in sheets_by_name.values()
+                for output in outputs
+            ]
+
+        composites = composite_all(sheets)
+        indexed_composites = composite_all(indexed_sheets)
+        out_dir = root / f'scale_{scale}_out'
+        out_dir.mkdir(exist_ok=True)
+
+        def write_all(grids):
+            for i, sprites in enumerate(grids):
+                sprite_diagnostic.write_stacked_sprites(sprites, out_dir / f'{i}.png', max_cols=sprite_diagnostic.MAX_SPRITE_COLUMNS)
+
+        def recolor_all(indexed):
+            for path in sheet_paths:
+                img = Image.open(path)
+                if indexed:
+                    img = spritesheet.index_image(img, spritesheet.Palette())
+                replace_colors(img, color_map)
+
+        benchmarks = {
+            'load_spritesheet_at_path': (lambda: load_sheets(loader), len(sheet_paths) + len(head_paths)),
+            'load_spritesheet_at_path[indexed]': (lambda: load_sheets(indexed_loader), len(sheet_paths) + len(head_paths)),
+            'load_metadata_at_path': (lambda: [loader.load_metadata_at_path(path) for path in metadata_paths], len(metadata_paths)),
+            'create_stacked_sprite': (lambda: composite_all(sheets), sum(map(len, composites))),
+            'create_stacked_sprite[indexed]': (lambda: composite_all(indexed_sheets), sum(map(len, indexed_composites))),
+            'write_stacked_sprites': (lambda: write_all(composites), len(composites)),
+            'write_stacked_sprites[indexed]': (lambda: write_all(indexed_composites), len(indexed_composites)),
+            'replace_colors': (lambda: recolor_all(False), len(sheet_paths)),
+            'replace_colors[indexed]': (lambda: recolor_all(True), len(sheet_paths)),
+            'analyze_palette': (lambda: analyze_palette(sheet_paths), len(sheet_paths)),
+        }
+
+        for name, (func, items) in benchmarks.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                durations = time_call(func, repeat)
+            result = {
+                'benchmark': name,
+                'scale': scale,
+                'items': items,
+                'repeat': repeat,
+                'min_s': min(durations),
+                'median_s': statistics.median(durations),
+                'per_item_ms': min(durations) / items * 1000 if items else None,
+            }
+            results.append(result)
+            print(f"  {name:<36} scale={scale:<4} min={result['min_s']:.4f}s  median={result['median_s']:.4f}s  ({items} items)")
+
+    return results
+
+
+def compare_results(baseline, current, threshold):
+    """Prints the change in min time for every benchmark present in both runs. Returns True if any regressed past threshold."""
+    previous = {(r['benchmark'], r['scale']): r for r in baseline['results']}
+    regressed = False
+    print(f"\nComparison against baseline from {baseline['meta'].get('timestamp', 'unknown')}:")
+    for result in current['results']:
+        old = previous.get((result['benchmark'], result['scale']))
+        if old is None or not old['min_s']:
+            continue
+        ratio = result['min_s'] / old['min_s']
+        marker = ''
+        if ratio > 1 + threshold:
+            marker = '  <-- REGRESSION'
+            regressed = True
+        print(f"  {result['benchmark']:<36} scale={result['scale']:<4} {old['min_s']:.4f}s -> {result['min_s']:.4f}s  ({ratio:.2f}x){marker}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slicing, XML loading, compositing, recoloring and sheet encoding on synthetic skins.")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Number of synthetic skins per run (default: 1 4 16).")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Timed repetitions per benchmark; the minimum is reported.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for synthetic skin generation.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f"JSON file to write results to (default: {DEFAULT_OUTPUT}).")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="Compare against a previous results file and exit non-zero on regressions.")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression (default: 0.10).")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(Path(args.compare).read_text())
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline '{args.compare}': {e}")
+            sys.exit(1)
+
+    output_path = Path(args.output).resolve()
+    with tempfile.TemporaryDirectory(prefix='dj2020-bench-') as tmp:
+        # analyze_palette writes its diagnostic image to the working directory.
+        cwd = Path.cwd()
+        os.chdir(tmp)
+        try:
+            print(f"Running benchmarks at scales {args.scales} (repeat={args.repeat})...")
+            results = run_benchmarks(Path(tmp), args.scales, args.repeat, args.seed)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    output_path.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved benchmark results to '{output_path}'")
+
+    if baseline is not None and compare_results(baseline, report, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
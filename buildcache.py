@@ -0,0 +1,79 @@
+import hashlib
+import json
+from pathlib import Path
+
+# Bump when the manifest layout changes so old manifests are treated as stale.
+MANIFEST_VERSION = 1
+
+BUILD_CACHE_FILENAME = '.diagnostic_build_cache.json'
+
+
+def hash_file(path):
+    """Returns the SHA-256 hex digest of a file's contents, or None if it doesn't exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    A make-style record of the inputs each generated file was built from.
+
+    Every output is stored with a signature: the content hashes of its input files plus
+    the rendering flags used. An output is stale when it is missing on disk or when its
+    current signature differs from the recorded one.
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = Path(manifest_path)
+        self._hashes = {}
+        self.outputs = {}
+        if self.manifest_path.is_file():
+            try:
+                manifest = json.loads(self.manifest_path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable build cache '{self.manifest_path}': {e}")
+                manifest = {}
+            if manifest.get('version') == MANIFEST_VERSION:
+                self.outputs = manifest.get('outputs', {})
+
+    def file_hash(self, path):
+        """Hashes an input file, memoized for the lifetime of this cache (inputs are shared by many outputs)."""
+        key = str(path)
+        if key not in self._hashes:
+            self._hashes[key] = hash_file(path)
+        return self._hashes[key]
+
+    def signature(self, input_paths, flags):
+        """Builds the signature for an output from its input files and rendering flags."""
+        return {
+            'inputs': {str(path): self.file_hash(path) for path in sorted(input_paths, key=str)},
+            'flags': flags,
+        }
+
+    def is_stale(self, output_path, signature):
+        return not Path(output_path).is_file() or self.outputs.get(str(output_path)) != signature
+
+    def stale_inputs(self, output_path, signature):
+        """Explains why an output is stale: the input paths (or 'flags') whose recorded value changed."""
+        recorded = self.outputs.get(str(output_path))
+        if recorded is None:
+            return ['(never built)'] if Path(output_path).is_file() else ['(missing)']
+        changed = [path for path, digest in signature['inputs'].items() if recorded.get('inputs', {}).get(path) != digest]
+        if recorded.get('flags') != signature['flags']:
+            changed.append('flags')
+        if not changed and not Path(output_path).is_file():
+            changed.append('(missing)')
+        return changed
+
+    def record(self, output_path, signature):
+        self.outputs[str(output_path)] = signature
+
+    def save(self):
+        manifest = {'version': MANIFEST_VERSION, 'outputs': self.outputs}
+        self.manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
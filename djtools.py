@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import importlib
+import importlib.util
+import sys
+from pathlib import Path
+
+# Single entry point for the sprite tools: `djtools.py COMMAND [ARGS...]`.
+#
+# Nothing beyond the standard library is imported here. A command's module (and with it PIL,
+# numpy and ElementTree) is only imported once that command runs, so `--help` and `list`
+# start without paying for them. Each command parses its own arguments, so
+# `djtools.py COMMAND --help` shows that tool's options.
+
+# --- Configuration ---
+# Command -> (module name, or script filename for scripts that can't be imported by name; summary).
+COMMANDS = {
+    'list': ('skin_catalog', "List every skin with its sheet sizes and formats, reading only PNG headers."),
+    'diagnostic': ('sprite-diagnostic.py', "Diagnose and combine character sprites from legs, torso, and head parts."),
+    'recolor': ('recolor_tool', "Recolor character spritesheets by replacing specific palette colors."),
+    'metadata': ('metadata_tool', "Manage sprite metadata."),
+    'validate': ('validate_skins', "Check sheet sizes, metadata record counts and index-table frames for every skin."),
+    'autofit': ('autofit_offsets', "Propose head and torso offsets from the sprites' alpha masks."),
+    'diff': ('sheet_diff', "Show which cells changed between two sheets, two skins, or a sheet and its git revision."),
+    'effects': ('selection_effects', "Generate outline and drop-shadow sheets for every skin."),
+    'palette': ('palette_export', "Export skins as 8-bit index maps plus a palette strip per color variant."),
+    'bake': ('bake_atlases', "Pre-composite NPC (legs, torso, head) combos into atlases with frame tables."),
+    'frames': ('frame_index', "Content-hash every sprite cell and report duplication per skin."),
+    'serve': ('preview_server', "Serve composited character animations over HTTP for quick review."),
+    'load': ('skin_loader', "Load the whole library with the async bulk loader and report the results."),
+    'audio': ('audio_falloff', "Bake audio falloff curves into lookup tables."),
+    'benchmark': ('benchmark', "Benchmark the sprite pipeline on synthetic skins."),
+}
+
+
+def print_usage(file=sys.stdout):
+    width = max(len(name) for name in COMMANDS)
+    print("usage: djtools.py COMMAND [ARGS...]\n\ncommands:", file=file)
+    for name, (_, summary) in COMMANDS.items():
+        print(f"  {name:<{width}}  {summary}", file=file)
+    print("\nRun 'djtools.py COMMAND --help' for a command's options.", file=file)
+
+
+def load_command(name):
+    """Imports a command's module on demand."""
+    module_name, _ = COMMANDS[name]
+    if not module_name.endswith('.py'):
+        return importlib.import_module(module_name)
+    # Script filenames with a hyphen have to be loaded by path.
+    spec = importlib.util.spec_from_file_location(Path(module_name).stem.replace('-', '_'), Path(__file__).parent / module_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print_usage()
+        return
+    name, args = sys.argv[1], sys.argv[2:]
+    if name not in COMMANDS:
+        print(f"Error: Unknown command '{name}'.\n", file=sys.stderr)
+        print_usage(sys.stderr)
+        sys.exit(2)
+
+    # The command's argparse sees only its own arguments, and names itself 'djtools.py COMMAND'.
+    sys.argv = [f'djtools.py {name}'] + args
+    load_command(name).main()
+
+
+if __name__ == '__main__':
+    main()
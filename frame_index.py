@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from skin_catalog import load_config, open_catalog
+
+# PIL and spritesheet are imported by atlas_digests, the only code that decodes sheets, so
+# --help and a fully cached index start without loading them.
+
+# --- Configuration ---
+INDEX_FILENAME = '.frame_index.json'
+INDEX_VERSION = 1
+
+BODY_SPRITE_SIZE = (64, 64)
+HEAD_SPRITE_SIZE = (32, 32)
+
+
+def atlas_digests(path, sprite_size):
+    """
+    Content-hashes every cell of a sheet. Returns (digests, empty) where empty[i] is True
+    for cells with no opaque pixels. Digests match spritesheet.cell_digest for RGBA cells.
+    """
+    from PIL import Image
+    from spritesheet import slice_atlas
+
+    cells = slice_atlas(Image.open(path), sprite_size).copy()
+    cells[cells[..., 3] == 0] = 0
+    empty = ~cells[..., 3].any(axis=(1, 2))
+    person = b'%dx%d' % sprite_size
+    digests = [hashlib.blake2b(cell.tobytes(), digest_size=16, person=person).hexdigest() for cell in cells]
+    return digests, empty.tolist()
+
+
+class FrameIndex:
+    """
+    Maps every 64x64 body cell and 32x32 head cell in the skin tree to a content hash.
+
+    Per-sheet results are cached in an index file keyed by mtime and size, so rebuilding
+    after an edit only re-hashes the sheets that changed. Besides this tool's report, the
+    index supplies cell digests to Spritesheet(dedup=True), whose composites and previews are
+    keyed by them, and to recolor_tool --mass-recolor, which recolors repeated cells once.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = Path(index_path) if index_path else None
+        self.sheets = {}  # str(path) -> {'mtime_ns', 'size', 'sprite_size', 'digests', 'empty'}
+        self.skins = {}   # skin name -> [sheet path, ...]
+        if self.index_path is not None and self.index_path.is_file():
+            try:
+                cached = json.loads(self.index_path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable frame index '{self.index_path}': {e}")
+                cached = {}
+            if cached.get('version') == INDEX_VERSION:
+                self.sheets = cached.get('sheets', {})
+
+    def sheet_entry(self, path, sprite_size):
+        """Returns the cached entry for a sheet, re-hashing it only if its mtime, size or cell size changed."""
+        stat = path.stat()
+        entry = self.sheets.get(str(path))
+        if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size or tuple(entry['sprite_size']) != sprite_size:
+            digests, empty = atlas_digests(path, sprite_size)
+            entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sprite_size': list(sprite_size), 'digests': digests, 'empty': empty}
+            self.sheets[str(path)] = entry
+        return entry
+
+    def cell_digests(self, path, sprite_size):
+        """A sheet's cell digests in slice_atlas order, hashing the sheet only if the index doesn't have it yet."""
+        return self.sheet_entry(Path(path), tuple(sprite_size))['digests']
+
+    def repeated_digests(self):
+        """Digests of the cells that occur more than once across the built sheets, empty cells included."""
+        counts = defaultdict(int)
+        for paths in self.skins.values():
+            for path in paths:
+                for digest in self.sheets[str(path)]['digests']:
+                    counts[digest] += 1
+        return {digest for digest, count in counts.items() if count > 1}
+
+    def build(self, skin_dirs, head_dir):
+        """Indexes every PNG of each skin directory plus the skin's head sheet, if there is one."""
+        for skin_name, skin_dir in sorted(skin_dirs.items()):
+            paths = []
+            for path in sorted(Path(skin_dir).glob('*.png')):
+                self.sheet_entry(path, BODY_SPRITE_SIZE)
+                paths.append(path)
+            head_path = Path(head_dir) / f'{skin_name}.png'
+            if head_path.is_file():
+                self.sheet_entry(head_path, HEAD_SPRITE_SIZE)
+                paths.append(head_path)
+            self.skins[skin_name] = paths
+        return self
+
+    def report(self):
+        """Per-skin and library-wide cell counts, unique cells and duplication ratios (empty cells excluded)."""
+        skin_digests = {}
+        skins = {}
+        for skin_name, paths in self.skins.items():
+            cells = empty_cells = 0
+            digests = []
+            for path in paths:
+                entry = self.sheets[str(path)]
+                cells += len(entry['digests'])
+                empty_cells += sum(entry['empty'])
+                digests.extend(digest for digest, empty in zip(entry['digests'], entry['empty']) if not empty)
+            skin_digests[skin_name] = set(digests)
+            skins[skin_name] = {
+                'sheets': len(paths),
+                'cells': cells,
+                'empty_cells': empty_cells,
+                'unique_cells': len(skin_digests[skin_name]),
+                'duplication_ratio': 1 - len(skin_digests[skin_name]) / len(digests) if digests else 0.0,
+            }
+
+        owners = defaultdict(int)
+        for digests in skin_digests.values():
+            for digest in digests:
+                owners[digest] += 1
+        for skin_name, digests in skin_digests.items():
+            skins[skin_name]['shared_with_other_skins'] = sum(1 for digest in digests if owners[digest] > 1)
+
+        non_empty = sum(skin['cells'] - skin['empty_cells'] for skin in skins.values())
+        return {
+            'skins': skins,
+            'total': {
+                'cells': sum(skin['cells'] for skin in skins.values()),
+                'non_empty_cells': non_empty,
+                'unique_cells': len(owners),
+                'duplication_ratio': 1 - len(owners) / non_empty if non_empty else 0.0,
+            },
+        }
+
+    def save(self):
+        if self.index_path is not None:
+            self.index_path.write_text(json.dumps({'version': INDEX_VERSION, 'sheets': self.sheets}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-hash every sprite cell in the skin tree and report duplication per skin.")
+    parser.add_argument('--json', metavar='PATH', help="Write the report as JSON to PATH.")
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the cached index and re-hash every sheet.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    catalog = open_catalog(config)
+    index = FrameIndex(None if args.rebuild else Path.cwd() / INDEX_FILENAME)
+    index.index_path = Path.cwd() / INDEX_FILENAME
+    index.build(catalog.skin_dirs(), catalog.head_dir)
+    index.save()
+
+    report = index.report()
+    print(f"{'skin':<24} {'cells':>7} {'empty':>7} {'unique':>7} {'dup %':>7} {'shared':>7}")
+    for skin_name, stats in report['skins'].items():
+        print(f"{skin_name:<24} {stats['cells']:>7} {stats['empty_cells']:>7} {stats['unique_cells']:>7} "
+              f"{stats['duplication_ratio'] * 100:>6.1f}% {stats['shared_with_other_skins']:>7}")
+    total = report['total']
+    print(f"\nLibrary: {total['non_empty_cells']} non-empty cells, {total['unique_cells']} unique "
+          f"({total['duplication_ratio'] * 100:.1f}% duplicated).")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Saved report to '{args.json}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,22 +2,16 @@ import argparse
 from pathlib import Path
 import sys
 
-from spritesheet import Spritesheet
-from spritesheet import Spritesheet, save_metadata_at_path, SpriteMetadata
-
-# --- Configuration ---
-SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets'
-EXCLUDE_SKINS = ['cyber', 'generic64', 'gibs', 'head']
+from skin_catalog import load_config, open_catalog
 
 def main():
     """Main function to run the metadata tool."""
-    spritesheet_path = Path(SPRITESHEET_DIRECTORY)
-
-    if not spritesheet_path.is_dir():
-        print(f"Error: The base spritesheet directory was not found at '{SPRITESHEET_DIRECTORY}'")
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
         sys.exit(1)
 
-    available_dirs = {d.name: d for d in spritesheet_path.iterdir() if d.is_dir() and d.name not in EXCLUDE_SKINS}
+    available_dirs = open_catalog(config).skin_dirs()
     available_dir_names = sorted(available_dirs.keys())
 
     parser = argparse.ArgumentParser(description="A tool for managing sprite metadata.")
@@ -37,6 +31,9 @@ def main():
     )
     args = parser.parse_args()
 
+    # Imported only once there is work to do, so --help doesn't load PIL and numpy.
+    from spritesheet import Spritesheet, save_metadata_at_path
+
     from_sheet_dir = available_dirs[args.from_sheet]
     to_sheet_dir = available_dirs[args.to_sheet]
 
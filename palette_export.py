@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from recolor_tool import RECOLOR_DARK, PaletteMatcher, parse_hex_color, replace_colors
+from skin_catalog import load_config, open_catalog
+
+# numpy, PIL and recolor_recipes are imported by the functions that build and check palettes,
+# as in recolor_tool.py, so --help starts without them.
+
+# --- Configuration ---
+DEFAULT_OUTPUT_DIRECTORY = 'palette_swap'
+
+# Index 0 of every palette is fully transparent, like TRANSPARENT_INDEX in spritesheet.py.
+MAX_PALETTE_SIZE = 256
+
+
+def pack_rgba(pixels):
+    """Packs (..., 4) uint8 pixels into uint32 keys, with every fully transparent pixel packed as 0."""
+    import numpy as np
+    from recolor_recipes import pack_rgb
+
+    keys = (pack_rgb(pixels[..., :3]) << 8) | pixels[..., 3].astype(np.uint32)
+    return np.where(pixels[..., 3] == 0, 0, keys)
+
+
+def build_index_maps(sheets):
+    """
+    Gives every distinct RGBA color across a skin's sheets one palette index, with index 0
+    for transparency. Returns (palette as an (N, 4) uint8 array, {name: (h, w) uint8 index map}).
+    Raises ValueError if the sheets use more than 256 colors between them.
+    """
+    import numpy as np
+    from recolor_recipes import unpack_rgb
+
+    keys = {name: pack_rgba(pixels) for name, pixels in sheets.items()}
+    colors = np.union1d(np.zeros(1, dtype=np.uint32), np.unique(np.concatenate([np.unique(k) for k in keys.values()])))
+    if len(colors) > MAX_PALETTE_SIZE:
+        raise ValueError(f"{len(colors) - 1} colors (plus transparency) don't fit an 8-bit index map.")
+    palette = np.concatenate([unpack_rgb(colors >> 8), (colors & 0xFF).astype(np.uint8)[:, None]], axis=1)
+    return palette, {name: np.searchsorted(colors, k).astype(np.uint8) for name, k in keys.items()}
+
+
+def variant_palette(palette, matcher):
+    """Recolors a palette's RGB with the same matcher replace_colors would use; alpha is kept."""
+    from recolor_recipes import pack_rgb, unpack_rgb
+
+    variant = palette.copy()
+    variant[:, :3] = unpack_rgb(matcher.resolve(pack_rgb(palette[:, :3])))
+    variant[0] = 0
+    return variant
+
+
+def verify_variant(pixels, index_map, palette, matcher):
+    """
+    Checks that palette[index_map] reproduces replace_colors for one sheet: same alpha
+    everywhere, same RGB wherever a pixel is visible. Returns the number of mismatched pixels.
+    """
+    import numpy as np
+    from PIL import Image
+
+    expected = np.array(replace_colors(Image.fromarray(pixels, "RGBA"), {}, matcher=matcher))
+    actual = palette[index_map]
+    visible = expected[..., 3] > 0
+    mismatched = (actual[..., 3] != expected[..., 3]) | (visible & (actual[..., :3] != expected[..., :3]).any(axis=2))
+    return int(mismatched.sum())
+
+
+def export_skin(skin_name, sheet_paths, variants, output_dir):
+    """
+    Writes a skin's index maps and one palette strip per variant, verifying every
+    (sheet, variant) pair against replace_colors. `sheet_paths` maps output names to
+    source sheets. Returns a manifest dict for the skin.
+    """
+    import numpy as np
+    from PIL import Image
+
+    sheets = {name: np.array(Image.open(path).convert("RGBA")) for name, path in sheet_paths.items()}
+    palette, index_maps = build_index_maps(sheets)
+
+    skin_dir = output_dir / skin_name
+    skin_dir.mkdir(parents=True, exist_ok=True)
+    for name, index_map in index_maps.items():
+        Image.fromarray(index_map, "L").save(skin_dir / name)
+
+    palettes = {}
+    for variant_name, matcher in variants.items():
+        strip = variant_palette(palette, matcher) if matcher is not None else palette
+        for name, index_map in index_maps.items():
+            mismatched = verify_variant(sheets[name], index_map, strip, matcher or PaletteMatcher({}))
+            if mismatched:
+                raise ValueError(f"'{name}' variant '{variant_name}' differs from replace_colors in {mismatched} pixels.")
+        strip_name = f'palette_{variant_name}.png'
+        Image.fromarray(strip[None], "RGBA").save(skin_dir / strip_name)
+        palettes[variant_name] = strip_name
+
+    return {
+        'sheets': sorted(index_maps),
+        'palette_size': len(palette),
+        'palettes': palettes,
+        'source_bytes': sum(path.stat().st_size for path in sheet_paths.values()),
+        'exported_bytes': sum(path.stat().st_size for path in skin_dir.glob('*.png')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export skins as 8-bit index maps plus a palette strip per color variant.")
+    parser.add_argument('skins', nargs='*', metavar='SKIN', help="Skins to export. Default is every skin.")
+    parser.add_argument('--recipe', action='append', default=[], metavar='RECIPE_JSON', help="Add a variant from a recolor recipe. Can be given multiple times.")
+    parser.add_argument('--tolerance', type=float, default=0.0, metavar='DISTANCE', help="Tolerance for the built-in skintone variant, as in recolor_tool.py.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIRECTORY, help=f"Output directory. Default is '{DEFAULT_OUTPUT_DIRECTORY}'.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    catalog = open_catalog(config, full=True)
+    skin_names = args.skins or list(catalog.skins)
+    for skin_name in skin_names:
+        if skin_name not in catalog.skins:
+            print(f"Error: Unknown skin '{skin_name}'.")
+            sys.exit(1)
+
+    # The same variants --mass-recolor would bake, each sharing one matcher across the library.
+    variants = {
+        'base': None,
+        'skintone_2': PaletteMatcher({parse_hex_color(k): parse_hex_color(v) for k, v in RECOLOR_DARK.items()}, args.tolerance),
+    }
+    from recolor_recipes import load_recipe
+
+    for recipe_path in args.recipe:
+        try:
+            recipe = load_recipe(recipe_path)
+        except (OSError, ValueError) as e:
+            print(f"Error loading recipe '{recipe_path}': {e}")
+            sys.exit(1)
+        variants[recipe.name] = recipe
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for skin_name in skin_names:
+        sheet_paths = {name: catalog.root / skin_name / name for name in catalog.skins[skin_name] if name.endswith('.png')}
+        head_path = catalog.head_path(skin_name)
+        if head_path is not None:
+            sheet_paths['head.png'] = head_path
+        try:
+            manifest[skin_name] = export_skin(skin_name, sheet_paths, variants, output_dir)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not export '{skin_name}': {e}")
+            continue
+        entry = manifest[skin_name]
+        print(f"{skin_name}: {len(entry['sheets'])} index maps, {entry['palette_size']} colors, {len(variants)} palettes (verified)")
+
+    (output_dir / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    baked = sum(entry['source_bytes'] for entry in manifest.values()) * len(variants)
+    exported = sum(entry['exported_bytes'] for entry in manifest.values())
+    print(f"\nExported {len(manifest)} skins to '{output_dir}': {exported / 1024:.1f} KiB, versus {baked / 1024:.1f} KiB for baked copies of {len(variants)} variants.")
+
+
+if __name__ == '__main__':
+    main()
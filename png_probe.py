@@ -0,0 +1,41 @@
+import struct
+from dataclasses import dataclass
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+COLOR_TYPES = {
+    0: 'grayscale',
+    2: 'rgb',
+    3: 'indexed',
+    4: 'grayscale_alpha',
+    6: 'rgba',
+}
+
+
+@dataclass
+class PngHeader:
+    """Image properties read from a PNG's IHDR chunk, without decoding any pixel data."""
+    width: int
+    height: int
+    bit_depth: int
+    color_type: int
+
+    @property
+    def color_type_name(self):
+        return COLOR_TYPES.get(self.color_type, 'unknown')
+
+
+def read_png_header(path):
+    """
+    Reads the signature and IHDR chunk (the first 33 bytes) of a PNG file.
+    Raises ValueError if the file is not a PNG or its header is truncated.
+    """
+    with open(path, 'rb') as f:
+        data = f.read(33)
+    if len(data) < 33 or data[:8] != PNG_SIGNATURE:
+        raise ValueError(f"'{path}' is not a PNG file.")
+    length, chunk_type = struct.unpack('>I4s', data[8:16])
+    if chunk_type != b'IHDR' or length != 13:
+        raise ValueError(f"'{path}' does not start with an IHDR chunk.")
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', data[16:26])
+    return PngHeader(width, height, bit_depth, color_type)
@@ -0,0 +1,196 @@
+import io
+from pathlib import Path
+
+from PIL import Image
+
+from indexes import (
+    Direction, get_head_indexes, get_leg_indexes, get_pistol_indexes, get_rifle_indexes,
+    get_shotgun_indexes, get_smg_indexes, get_unarmed_indexes,
+)
+
+# Index tables per torso type, keyed by the torso_type names Spritesheet.create_stacked_sprite uses.
+TORSO_INDEX_FUNCS = {
+    'unarmed': get_unarmed_indexes,
+    'pistol': get_pistol_indexes,
+    'smg': get_smg_indexes,
+    'rifle': get_rifle_indexes,
+    'shotgun': get_shotgun_indexes,
+}
+
+# Animations exported per torso type by export_previews.
+PREVIEW_ANIMATIONS = {
+    'unarmed': ['idle', 'walk', 'run', 'crouch', 'crawl', 'climb', 'jump', 'use', 'handsUp', 'dead', 'keelOver'],
+    'pistol': ['idle', 'shoot', 'rack', 'reload', 'run'],
+    'smg': ['idle', 'shoot', 'rack', 'reload', 'run'],
+    'rifle': ['idle', 'shoot', 'rack', 'reload', 'run'],
+    'shotgun': ['idle', 'shoot', 'rack', 'reload', 'run'],
+}
+
+# Animations where the legs move along with the torso; everything else holds one leg stance.
+LEG_ANIMATIONS = ('walk', 'run', 'crawl', 'climb')
+
+# The index tables carry no timing, so previews play at a fixed rate.
+FRAME_DURATION_MS = 100
+
+PREVIEW_FORMATS = ('gif', 'apng', 'strip')
+
+
+def animation_frames(torso_type, animation, direction, leg_stance='idle'):
+    """
+    Lists (leg_index, torso_index, head_index) for each frame of one animation and direction.
+
+    Unarmed animations and moving-leg animations (walk, run, ...) pair leg and torso frames,
+    cycling the shorter list. Weapon animations, and unarmed ones the leg table has no entry
+    for (use, handsUp), hold the first frame of `leg_stance`.
+    Returns an empty list if the index tables have no frames for the combination.
+    """
+    torso_indexes = TORSO_INDEX_FUNCS[torso_type](direction, animation)
+    leg_indexes = None
+    if torso_type == 'unarmed' or animation in LEG_ANIMATIONS:
+        leg_indexes = get_leg_indexes(direction, animation)
+    if not leg_indexes and animation not in LEG_ANIMATIONS:
+        leg_indexes = get_leg_indexes(direction, leg_stance)
+        leg_indexes = leg_indexes[:1] if leg_indexes else leg_indexes
+    head_indexes = get_head_indexes(direction)
+    if not torso_indexes or not leg_indexes or not head_indexes:
+        return []
+
+    frame_count = max(len(torso_indexes), len(leg_indexes))
+    return [(leg_indexes[i % len(leg_indexes)], torso_indexes[i % len(torso_indexes)], head_indexes[0]) for i in range(frame_count)]
+
+
+def render_frames(sheet, torso_type, frames, cache=None):
+    """
+    Composites frames with a Spritesheet and pads them to a common size so they can be animated.
+
+    Each distinct (torso_type, leg, torso, head) combination is composited once; repeats,
+    like the 22 in a [21, 22, 23, 22] rack, reuse the same image object. With a dedup sheet,
+    frames are keyed by Spritesheet.composite_key instead, so pixel-identical frames from
+    different cells are one image too, and the encoder merges and flattens them once.
+    Pass a shared `cache` dict to reuse composites across animations as well.
+    """
+    cache = {} if cache is None else cache
+    keys = []
+    for frame in frames:
+        key = sheet.composite_key(*frame, torso_type=torso_type) if sheet.dedup else (torso_type,) + tuple(frame)
+        if key not in cache:
+            sprite = sheet.create_stacked_sprite(*frame, torso_type=torso_type)
+            cache[key] = sprite if sprite.mode == "RGBA" else sprite.convert("RGBA")
+        keys.append(key)
+
+    width = max(cache[key].width for key in keys)
+    height = max(cache[key].height for key in keys)
+    padded = {}
+    for key in dict.fromkeys(keys):
+        sprite = cache[key]
+        if sprite.size != (width, height):
+            canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+            canvas.paste(sprite, (0, 0))
+            sprite = canvas
+        padded[key] = sprite
+    return [padded[key] for key in keys]
+
+
+def merge_repeated_frames(images, duration=FRAME_DURATION_MS):
+    """Collapses runs of identical consecutive frames into one frame with a longer duration."""
+    merged, durations = [], []
+    for image in images:
+        if merged and (image is merged[-1] or image.tobytes() == merged[-1].tobytes()):
+            durations[-1] += duration
+        else:
+            merged.append(image)
+            durations.append(duration)
+    return merged, durations
+
+
+def encode_strip(images):
+    """Lays frames out left to right in a single PNG."""
+    strip = Image.new("RGBA", (sum(image.width for image in images), max(image.height for image in images)), (0, 0, 0, 0))
+    x = 0
+    for image in images:
+        strip.paste(image, (x, 0))
+        x += image.width
+    buffer = io.BytesIO()
+    strip.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def encode_animation(images, fmt='gif', duration=FRAME_DURATION_MS, bg_color=None):
+    """
+    Encodes frames as an animated GIF or APNG, or as a PNG strip. Returns the encoded bytes.
+
+    Repeated consecutive frames are stored once with a longer duration. APNG frames are
+    kept on the canvas (dispose none, blend source), so Pillow stores each frame as only the
+    rectangle that differs from the previous one. GIF can't erase to transparency that way,
+    so it uses the same delta rectangles only when frames are flattened onto `bg_color`.
+    """
+    if fmt == 'strip':
+        return encode_strip(images)
+
+    if bg_color is not None:
+        flattened = {}
+        for image in images:
+            if id(image) not in flattened:
+                background = Image.new("RGBA", image.size, bg_color)
+                background.alpha_composite(image)
+                flattened[id(image)] = background
+        images = [flattened[id(image)] for image in images]
+    images, durations = merge_repeated_frames(images, duration)
+
+    buffer = io.BytesIO()
+    if fmt == 'gif':
+        disposal = 1 if bg_color is not None else 2
+        images[0].save(buffer, format='GIF', save_all=True, append_images=images[1:], duration=durations, loop=0, disposal=disposal)
+    elif fmt == 'apng':
+        images[0].save(buffer, format='PNG', save_all=True, append_images=images[1:], duration=durations, loop=0, disposal=0, blend=0)
+    else:
+        raise ValueError(f"Unknown preview format '{fmt}'. Expected one of {', '.join(PREVIEW_FORMATS)}.")
+    return buffer.getvalue()
+
+
+def export_previews(sheet, output_dir, fmt='apng', leg_stance='idle', bg_color=None):
+    """
+    Writes one animated preview per (weapon, animation, direction) found in the index tables
+    to output_dir as '{weapon}_{animation}_{direction}.{gif|png}'. Composites are shared
+    across every preview, so frames reused between animations are only drawn once.
+    Returns the list of written paths.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    extension = 'gif' if fmt == 'gif' else 'png'
+
+    cache = {}
+    written = []
+    frame_count = 0
+    total_bytes = 0
+    for torso_type, animations in PREVIEW_ANIMATIONS.items():
+        for animation in animations:
+            for direction in Direction:
+                frames = animation_frames(torso_type, animation, direction, leg_stance)
+                if not frames:
+                    # The torso has this animation but the leg or head table doesn't cover the direction.
+                    if TORSO_INDEX_FUNCS[torso_type](direction, animation):
+                        print(f"Warning: Skipping {torso_type} {animation} {direction.name}: no leg or head frames for it.")
+                    continue
+                try:
+                    images = render_frames(sheet, torso_type, frames, cache)
+                except (AttributeError, IndexError) as e:
+                    print(f"Warning: Skipping {torso_type} {animation} {direction.name}: {e}")
+                    continue
+                body = encode_animation(images, fmt, bg_color=bg_color)
+                path = output_dir / f'{torso_type}_{animation}_{direction.name}.{extension}'
+                path.write_bytes(body)
+                written.append(path)
+                frame_count += len(frames)
+                total_bytes += len(body)
+
+    print(f"Wrote {len(written)} previews to '{output_dir}': {frame_count} frames from {len(cache)} unique composites, {total_bytes / 1024:.1f} KiB total.")
+    return written
+
+
+def parse_direction(name):
+    """Looks up a Direction by name (down, rightDown, right, rightUp, up)."""
+    try:
+        return Direction[name]
+    except KeyError:
+        raise ValueError(f"Unknown direction '{name}'. Expected one of {', '.join(d.name for d in Direction)}.")
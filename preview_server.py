@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import html
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from skin_catalog import load_config, open_catalog
+
+# preview and spritesheet (and with them PIL and numpy) are imported by the methods that use
+# them, so --help returns without loading them.
+
+# --- Configuration ---
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8020
+MAX_CACHED_SHEETS = 16
+MAX_CACHED_RESPONSES = 512
+
+CONTENT_TYPES = {
+    'gif': 'image/gif',
+    'apng': 'image/apng',
+    'strip': 'image/png',
+}
+
+
+class PreviewCache:
+    """
+    Keeps loaded Spritesheets warm and remembers encoded responses.
+
+    Every response is keyed by an ETag derived from the request and the mtimes of the
+    sheet's source files, so editing a PNG or XML invalidates exactly the responses that
+    used it. When a cached Spritesheet's sources change, only the changed files are reloaded.
+
+    The shared lock only guards the two LRU dicts. Loading, reloading and rendering happen
+    outside it under a lock per (legs, torso, head), since a Spritesheet isn't safe to use
+    from two threads, so requests for different skins render concurrently.
+    """
+
+    def __init__(self, available_dirs, max_sheets=MAX_CACHED_SHEETS, max_responses=MAX_CACHED_RESPONSES):
+        self.available_dirs = available_dirs
+        self.max_sheets = max_sheets
+        self.max_responses = max_responses
+        self._sheets = OrderedDict()     # (legs, torso, head) -> (Spritesheet, {path: mtime_ns})
+        self._responses = OrderedDict()  # etag -> encoded bytes
+        self._sheet_locks = {}           # (legs, torso, head) -> lock held while using that Spritesheet
+        self._lock = threading.Lock()
+
+    def input_paths(self, legs, torso, head):
+        from spritesheet import spritesheet_input_paths
+
+        for skin_name in (legs, torso, head):
+            if skin_name not in self.available_dirs:
+                raise LookupError(f"Unknown skin '{skin_name}'.")
+        return spritesheet_input_paths(self.available_dirs[legs], self.available_dirs[torso], head)
+
+    @staticmethod
+    def source_mtimes(paths):
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtimes[path] = None
+        return mtimes
+
+    def _sheet_lock(self, skin_key):
+        with self._lock:
+            return self._sheet_locks.setdefault(skin_key, threading.Lock())
+
+    def _cached_response(self, etag):
+        with self._lock:
+            body = self._responses.get(etag)
+            if body is not None:
+                self._responses.move_to_end(etag)
+            return body
+
+    def _sheet(self, skin_key, paths, mtimes):
+        """
+        Returns a Spritesheet for skin_key, reloading only the source files whose mtimes changed.
+        Call with skin_key's sheet lock held. Raises OSError or ET.ParseError if a changed file
+        can't be reloaded; its old contents stay loaded and the reload is retried next time.
+        """
+        from spritesheet import Spritesheet
+
+        with self._lock:
+            cached = self._sheets.get(skin_key)
+        if cached is None:
+            # Every input is loaded now, so record every input's mtime, taken before loading
+            # so that an edit made during the load is picked up by the next request.
+            loaded_mtimes = self.source_mtimes(paths.values())
+            sheet = Spritesheet(*[self.available_dirs[name] for name in skin_key[:2]], skin_key[2])
+        else:
+            sheet, loaded_mtimes = cached
+            for path, mtime in mtimes.items():
+                if mtime is not None and loaded_mtimes.get(path) != mtime:
+                    sheet.reload(path)
+
+        # A request only checks the files it uses; the rest keep the mtimes they were loaded at.
+        loaded_mtimes.update(mtimes)
+        with self._lock:
+            self._sheets[skin_key] = (sheet, loaded_mtimes)
+            self._sheets.move_to_end(skin_key)
+            while len(self._sheets) > self.max_sheets:
+                evicted, _ = self._sheets.popitem(last=False)
+                # A thread still rendering the evicted sheet keeps its own reference and lock.
+                self._sheet_locks.pop(evicted, None)
+        return sheet
+
+    def render(self, legs, torso, head, torso_type, animation, direction, fmt, leg_stance):
+        """Returns (etag, body) for one preview, encoding it only if no cached response matches."""
+        from preview import animation_frames, encode_animation, render_frames
+
+        paths = self.input_paths(legs, torso, head)
+        attributes = ['leg_sprites', 'leg_metadata_list', 'head_sprites',
+                      'torso_sprites' if torso_type == 'unarmed' else f'{torso_type}_sprites', f'{torso_type}_metadata_list']
+        mtimes = self.source_mtimes([paths[attribute] for attribute in attributes])
+        request_key = (legs, torso, head, torso_type, animation, direction.name, fmt, leg_stance)
+        etag = '"' + hashlib.sha1(repr((request_key, sorted((str(p), m) for p, m in mtimes.items()))).encode()).hexdigest() + '"'
+
+        body = self._cached_response(etag)
+        if body is not None:
+            return etag, body
+
+        missing = [str(path) for path, mtime in mtimes.items() if mtime is None]
+        if missing:
+            raise LookupError(f"Missing source files: {', '.join(missing)}")
+        frames = animation_frames(torso_type, animation, direction, leg_stance)
+        if not frames:
+            raise LookupError(f"No frames for {torso_type} '{animation}' facing {direction.name}.")
+
+        skin_key = (legs, torso, head)
+        with self._sheet_lock(skin_key):
+            # Another request may have rendered the same preview while this one waited.
+            body = self._cached_response(etag)
+            if body is not None:
+                return etag, body
+            sheet = self._sheet(skin_key, paths, mtimes)
+            if not all(hasattr(sheet, attribute) for attribute in attributes):
+                with self._lock:
+                    self._sheets.pop(skin_key, None)
+                raise LookupError(f"Could not load sheets for {legs}/{torso}/{head}; see the server log.")
+            body = encode_animation(render_frames(sheet, torso_type, frames), fmt)
+
+        with self._lock:
+            self._responses[etag] = body
+            while len(self._responses) > self.max_responses:
+                self._responses.popitem(last=False)
+        return etag, body
+
+
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    """Serves /skin/{legs}/{torso}/{head}/{weapon}/{animation}/{direction}?format=gif|apng|strip&stance=idle|crouch."""
+
+    cache = None  # set by serve()
+
+    def do_GET(self):
+        from preview import PREVIEW_FORMATS, TORSO_INDEX_FUNCS, parse_direction
+
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        query = parse_qs(url.query)
+
+        if not parts:
+            self.send_index()
+            return
+        if parts[0] != 'skin' or len(parts) != 7:
+            self.send_text(404, "Expected /skin/{legs}/{torso}/{head}/{weapon}/{animation}/{direction}")
+            return
+
+        legs, torso, head, torso_type, animation, direction_name = parts[1:]
+        fmt = query.get('format', ['gif'])[0]
+        leg_stance = query.get('stance', ['idle'])[0]
+        try:
+            if torso_type not in TORSO_INDEX_FUNCS:
+                raise ValueError(f"Unknown weapon '{torso_type}'. Expected one of {', '.join(TORSO_INDEX_FUNCS)}.")
+            if fmt not in PREVIEW_FORMATS:
+                raise ValueError(f"Unknown format '{fmt}'. Expected one of {', '.join(PREVIEW_FORMATS)}.")
+            direction = parse_direction(direction_name)
+            etag, body = self.cache.render(legs, torso, head, torso_type, animation, direction, fmt, leg_stance)
+        except ValueError as e:
+            self.send_text(400, str(e))
+            return
+        except LookupError as e:
+            self.send_text(404, str(e))
+            return
+        except (OSError, ET.ParseError) as e:
+            # An edited sheet or XML that can't be read right now, e.g. mid-save or corrupt.
+            self.log_error("Could not render %s: %s", self.path, e)
+            self.send_text(500, f"Could not load sources: {e}")
+            return
+
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_text(self, status, text):
+        body = (text + '\n').encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_index(self):
+        from preview import TORSO_INDEX_FUNCS
+
+        skins = sorted(self.cache.available_dirs)
+        items = ''.join(f'<li>{html.escape(name)}</li>' for name in skins)
+        body = (
+            '<!doctype html><title>DJ2020 sprite preview</title>'
+            '<p>Request <code>/skin/{legs}/{torso}/{head}/{weapon}/{animation}/{direction}?format=gif|apng|strip&amp;stance=idle|crouch</code>, '
+            'e.g. <code>/skin/Jack/Jack/Jack/smg/reload/right</code>.</p>'
+            f'<p>Weapons: {", ".join(TORSO_INDEX_FUNCS)}</p><ul>{items}</ul>'
+        ).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(available_dirs, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    PreviewRequestHandler.cache = PreviewCache(available_dirs)
+    server = ThreadingHTTPServer((host, port), PreviewRequestHandler)
+    print(f"Serving sprite previews on http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve composited character animations over HTTP for quick review.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Interface to bind. Default is {DEFAULT_HOST}.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on. Default is {DEFAULT_PORT}.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    serve(open_catalog(config).skin_dirs(), args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# Module-level switch. When profiling is off, stage() hands back a shared no-op context
+# manager and count() returns immediately, so instrumented code pays one call and one check.
+_enabled = False
+_trace_path = None
+_start = time.perf_counter()
+_lock = threading.Lock()
+_timings = {}   # stage name -> [calls, total seconds]
+_counters = {}  # counter name -> total
+_events = []    # Chrome trace 'complete' events
+
+_NULL_STAGE = nullcontext()
+
+
+def enable(trace_path=None):
+    """Turns on profiling for the rest of the process and prints (and optionally writes) the report at exit."""
+    global _enabled, _trace_path
+    if not _enabled:
+        atexit.register(_report_at_exit)
+    _enabled = True
+    _trace_path = Path(trace_path) if trace_path else None
+
+
+def is_enabled():
+    return _enabled
+
+
+@contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            timing = _timings.setdefault(name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += end - start
+            if _trace_path is not None:
+                _events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start - _start) * 1e6,
+                    'dur': (end - start) * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                })
+
+
+def stage(name):
+    """Times the enclosed block under a named stage, e.g. `with profiling.stage('decode'):`."""
+    if not _enabled:
+        return _NULL_STAGE
+    return _timed_stage(name)
+
+
+def timed(name):
+    """Decorator form of stage() for functions that are a stage in their entirety."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _timed_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    """Adds to a named counter (sprites sliced, composites built, ...)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def print_report():
+    """Prints the per-stage breakdown, slowest stage first."""
+    total = time.perf_counter() - _start
+    print(f"\nProfile ({total:.3f}s wall clock):")
+    print(f"  {'stage':<20} {'calls':>8} {'total (s)':>10} {'mean (ms)':>10} {'% wall':>7}")
+    for name, (calls, seconds) in sorted(_timings.items(), key=lambda item: item[1][1], reverse=True):
+        print(f"  {name:<20} {calls:>8} {seconds:>10.3f} {seconds / calls * 1000:>10.3f} {seconds / total * 100:>6.1f}%")
+    if _counters:
+        print("  counters:")
+        for name, value in sorted(_counters.items()):
+            print(f"    {name:<18} {value:>8}")
+
+
+def write_chrome_trace(path):
+    """Writes the recorded stages as Chrome trace JSON (open in chrome://tracing or Perfetto)."""
+    with _lock:
+        events = list(_events)
+    Path(path).write_text(json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}))
+    print(f"Saved Chrome trace to '{path}'")
+
+
+def _report_at_exit():
+    print_report()
+    if _trace_path is not None:
+        write_chrome_trace(_trace_path)
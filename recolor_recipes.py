@@ -0,0 +1,166 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+# Keys a recipe step may use, per color space. Hue ranges are in degrees and may wrap (e.g. [330, 30]).
+STEP_KEYS = {
+    'hsv': {'space', 'hue_range', 'min_saturation', 'value_range', 'hue_shift', 'saturation_scale', 'value_scale'},
+    'oklab': {'space', 'hue_range', 'min_chroma', 'lightness_range', 'hue_shift', 'chroma_scale', 'lightness_shift'},
+}
+
+# Below these, hue is too unstable to mask on: grays, outlines and near-whites are left alone by default.
+DEFAULT_MIN_SATURATION = 0.15
+DEFAULT_MIN_CHROMA = 0.03
+
+
+def pack_rgb(rgb):
+    """Packs an (..., 3) uint8 array into (...) uint32 0xRRGGBB keys."""
+    rgb = rgb.astype(np.uint32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def unpack_rgb(keys):
+    keys = np.asarray(keys, dtype=np.uint32)
+    return np.stack([(keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF], axis=-1).astype(np.uint8)
+
+
+def rgb_to_hsv(rgb):
+    """(N, 3) floats in [0, 1] -> hue in degrees [0, 360), saturation and value in [0, 1]."""
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    value = rgb.max(axis=1)
+    chroma = value - rgb.min(axis=1)
+    saturation = np.where(value > 0, chroma / np.where(value > 0, value, 1), 0.0)
+    safe = np.where(chroma > 0, chroma, 1)
+    hue = np.select([chroma == 0, value == r, value == g], [0.0, ((g - b) / safe) % 6, (b - r) / safe + 2], (r - g) / safe + 4) * 60
+    return hue, saturation, value
+
+
+def hsv_to_rgb(hue, saturation, value):
+    def channel(n):
+        k = (n + hue / 60) % 6
+        return value - value * saturation * np.clip(np.minimum(k, 4 - k), 0, 1)
+    return np.stack([channel(5), channel(3), channel(1)], axis=1)
+
+
+def srgb_to_linear(c):
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(c):
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * np.maximum(c, 0) ** (1 / 2.4) - 0.055)
+
+
+def rgb_to_oklab(rgb):
+    """(N, 3) sRGB floats in [0, 1] -> (N, 3) OKLab (L, a, b)."""
+    lms = srgb_to_linear(rgb) @ np.array([
+        [0.4122214708, 0.2119034982, 0.0883024619],
+        [0.5363325363, 0.6806995451, 0.2817188376],
+        [0.0514459929, 0.1073969566, 0.6299787005],
+    ])
+    return np.cbrt(lms) @ np.array([
+        [0.2104542553, 1.9779984951, 0.0259040371],
+        [0.7936177850, -2.4285922050, 0.7827717662],
+        [-0.0040720468, 0.4505937099, -0.8086757660],
+    ])
+
+
+def oklab_to_rgb(lab):
+    lms = (lab @ np.array([
+        [1.0, 1.0, 1.0],
+        [0.3963377774, -0.1055613458, -0.0894841775],
+        [0.2158037573, -0.0638541728, -1.2914855480],
+    ])) ** 3
+    return linear_to_srgb(lms @ np.array([
+        [4.0767416621, -1.2684380046, -0.0041960863],
+        [-3.3077115913, 2.6097574011, -0.7034186147],
+        [0.2309699292, -0.3413193965, 1.7076147010],
+    ]))
+
+
+def in_hue_range(hue, hue_range):
+    """Hue mask for a [low, high] range in degrees; a range with low > high wraps through 0."""
+    if hue_range is None:
+        return np.ones(hue.shape, dtype=bool)
+    low, high = hue_range
+    return (hue >= low) & (hue <= high) if low <= high else (hue >= low) | (hue <= high)
+
+
+def in_range(values, value_range):
+    if value_range is None:
+        return np.ones(values.shape, dtype=bool)
+    return (values >= value_range[0]) & (values <= value_range[1])
+
+
+def apply_hsv_step(rgb, step):
+    hue, saturation, value = rgb_to_hsv(rgb)
+    mask = (in_hue_range(hue, step.get('hue_range')) & (saturation >= step.get('min_saturation', DEFAULT_MIN_SATURATION))
+            & in_range(value, step.get('value_range')))
+    hue = np.where(mask, (hue + step.get('hue_shift', 0)) % 360, hue)
+    saturation = np.where(mask, np.clip(saturation * step.get('saturation_scale', 1), 0, 1), saturation)
+    value = np.where(mask, np.clip(value * step.get('value_scale', 1), 0, 1), value)
+    return hsv_to_rgb(hue, saturation, value)
+
+
+def apply_oklab_step(rgb, step):
+    lab = rgb_to_oklab(rgb)
+    lightness = lab[:, 0]
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360
+    mask = (in_hue_range(hue, step.get('hue_range')) & (chroma >= step.get('min_chroma', DEFAULT_MIN_CHROMA))
+            & in_range(lightness, step.get('lightness_range')))
+    hue = np.radians(np.where(mask, hue + step.get('hue_shift', 0), hue))
+    chroma = np.where(mask, chroma * step.get('chroma_scale', 1), chroma)
+    lightness = np.where(mask, lightness + step.get('lightness_shift', 0), lightness)
+    return oklab_to_rgb(np.stack([lightness, chroma * np.cos(hue), chroma * np.sin(hue)], axis=1))
+
+
+STEP_FUNCS = {
+    'hsv': apply_hsv_step,
+    'oklab': apply_oklab_step,
+}
+
+
+class RecolorRecipe:
+    """
+    A named list of hue-masked HSV/OKLab transform steps, applied in order.
+
+    Recipes only ever see distinct colors: resolve() takes packed colors and caches each
+    result, so replace_colors(image, {}, matcher=recipe) transforms a sheet's palette and
+    applies it as a lookup table, and one recipe object can be shared across a whole library.
+    """
+
+    def __init__(self, name, steps):
+        for i, step in enumerate(steps):
+            space = step.get('space')
+            if space not in STEP_FUNCS:
+                raise ValueError(f"Step {i} of recipe '{name}' has unknown space '{space}'. Expected one of {', '.join(STEP_FUNCS)}.")
+            unknown = set(step) - STEP_KEYS[space]
+            if unknown:
+                raise ValueError(f"Step {i} of recipe '{name}' has unknown keys for {space}: {', '.join(sorted(unknown))}.")
+        self.name = name
+        self.steps = steps
+        self._resolved = {}  # packed color -> packed result
+
+    def transform(self, colors):
+        """Runs every step over an (N, 3) uint8 array of colors. Returns the (N, 3) uint8 results."""
+        rgb = colors.astype(np.float64) / 255
+        for step in self.steps:
+            # OKLab round trips can leave the sRGB gamut; every step must start from valid RGB.
+            rgb = np.clip(STEP_FUNCS[step['space']](rgb, step), 0, 1)
+        return np.rint(rgb * 255).astype(np.uint8)
+
+    def resolve(self, keys):
+        """Maps an array of distinct packed colors to their packed results."""
+        keys = np.asarray(keys, dtype=np.uint32)
+        missing = np.array([key for key in keys.tolist() if key not in self._resolved], dtype=np.uint32)
+        if len(missing):
+            self._resolved.update(zip(missing.tolist(), pack_rgb(self.transform(unpack_rgb(missing))).tolist()))
+        return np.array([self._resolved[key] for key in keys.tolist()], dtype=np.uint32)
+
+
+def load_recipe(path):
+    """Reads a recipe JSON file: {"name": ..., "steps": [{"space": "hsv" | "oklab", ...}, ...]}."""
+    path = Path(path)
+    data = json.loads(path.read_text())
+    return RecolorRecipe(data.get('name', path.stem), data.get('steps', []))
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 import argparse
 from pathlib import Path
+import shutil
 import sys
 from collections import Counter
-from PIL import Image, ImageDraw, ImageFont
 
-# --- Configuration ---
-# Paths matching those in sprite-diagnostic.py
-SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets'
-HEAD_SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets/head'
+import profiling
+from buildcache import hash_file
+from skin_catalog import load_config, open_catalog
+
+# numpy, PIL and the modules built on them are imported by the functions that decode and
+# recolor, so --help (e.g. through djtools.py) starts without loading them.
 
+# --- Configuration ---
+# Spritesheet paths come from skin_catalog.load_config, shared with sprite-diagnostic.py.
 
 SKINTONE_LIGHT_1 = "#EEC39A"
 SKINTONE_LIGHT_2 = "#D9A066"
@@ -34,35 +38,145 @@ def parse_hex_color(hex_str):
         raise ValueError(f"Invalid hex color code: '{hex_str}'")
     return tuple(int(hex_str[i:i+2], 16) for i in (0, 2, 4))
 
-def replace_colors(image, color_map):
+class PaletteMatcher:
+    """
+    Resolves colors against a recolor map: each color takes the target of the nearest source
+    color within `tolerance` (Euclidean RGB distance), or stays unchanged. With tolerance 0
+    this is exact matching. Results are cached per color, so sharing one matcher across a
+    library resolves every distinct color only once.
+    """
+
+    def __init__(self, color_map, tolerance=0.0):
+        import numpy as np
+        self.sources = np.array(list(color_map), dtype=np.int32).reshape(-1, 3)
+        self.targets = np.array(list(color_map.values()), dtype=np.uint32).reshape(-1, 3)
+        self.tolerance = tolerance
+        self._resolved = {}  # packed color -> packed replacement
+
+    def resolve(self, keys):
+        """Maps an array of distinct packed colors to their packed replacements."""
+        import numpy as np
+        from recolor_recipes import pack_rgb, unpack_rgb
+        keys = np.asarray(keys, dtype=np.uint32)
+        missing = np.array([key for key in keys.tolist() if key not in self._resolved], dtype=np.uint32)
+        if len(missing) and len(self.sources):
+            colors = unpack_rgb(missing).astype(np.int32)
+            distances = ((colors[:, None, :] - self.sources[None, :, :]) ** 2).sum(axis=2)
+            nearest = distances.argmin(axis=1)
+            within = distances[np.arange(len(missing)), nearest] <= self.tolerance ** 2
+            replacements = np.where(within, pack_rgb(self.targets[nearest]), missing)
+            self._resolved.update(zip(missing.tolist(), replacements.tolist()))
+        elif len(missing):
+            self._resolved.update((key, key) for key in missing.tolist())
+        return np.array([self._resolved[key] for key in keys.tolist()], dtype=np.uint32)
+
+class CellRecolors:
+    """
+    Recolored sheet cells keyed by frame-index digest, shared by every sheet of a recolor run,
+    so a cell repeated anywhere in the library is recolored once. Only digests in `repeated`
+    (FrameIndex.repeated_digests()) are kept, since a cell that occurs once is never looked up again.
+    """
+
+    def __init__(self, repeated):
+        self.repeated = repeated
+        self.cells = {}  # digest -> recolored (h, w, 4) cell
+
+def recolor_pixels(pixels, matcher):
+    """Recolors the RGB of an (..., 4) RGBA array in place through a matcher's resolve(); alpha is kept."""
+    import numpy as np
+    from recolor_recipes import pack_rgb, unpack_rgb
+    unique, inverse = np.unique(pack_rgb(pixels[..., :3]), return_inverse=True)
+    pixels[..., :3] = unpack_rgb(matcher.resolve(unique))[inverse.reshape(pixels.shape[:-1])]
+
+def recolor_cells(image, matcher, digests, cell_recolors, sprite_size=(64, 64)):
+    """
+    Recolors an RGBA sheet cell by cell: cells whose digest is in cell_recolors are copied from
+    it, and only the remaining distinct cells are recolored. `digests` are the sheet's cell
+    digests from a FrameIndex, in slice_atlas order.
+    """
+    import numpy as np
+    from spritesheet import slice_atlas, unslice_atlas
+    cells = slice_atlas(image, sprite_size)
+    pending = {}  # digest -> first cell with it
+    for i, digest in enumerate(digests):
+        if digest not in cell_recolors.cells:
+            pending.setdefault(digest, i)
+    fresh = {}
+    if pending:
+        recolored = cells[list(pending.values())]
+        recolor_pixels(recolored, matcher)
+        fresh = dict(zip(pending, recolored))
+        cell_recolors.cells.update((digest, cell) for digest, cell in fresh.items() if digest in cell_recolors.repeated)
+    profiling.count('cells reused', len(digests) - len(pending))
+    out = np.stack([fresh[digest] if digest in fresh else cell_recolors.cells[digest] for digest in digests])
+    return unslice_atlas(out, -(-image.width // sprite_size[0]), image.size)
+
+@profiling.timed('recolor')
+def replace_colors(image, color_map, tolerance=0.0, matcher=None, digests=None, cell_recolors=None):
     """
     Replaces colors in the image based on the provided map.
     color_map: dict mapping (r, g, b) -> (r, g, b)
     Preserves the original alpha channel of the pixels.
+
+    With a tolerance, every color within that RGB distance of a map key takes the nearest
+    key's replacement. Only the image's distinct colors are matched, then applied as a
+    lookup table, so a tolerant recolor costs about the same as an exact one. Pass a shared
+    PaletteMatcher to reuse matches across images, or a RecolorRecipe to run its transforms
+    instead of the color map.
+
+    Palette-indexed ('P') images are recolored by rewriting their palette table,
+    which costs O(palette) regardless of image size. RGBA sheets given their FrameIndex cell
+    `digests` and a shared CellRecolors reuse the cells already recolored (see recolor_cells).
     """
+    import numpy as np
+    from PIL import Image
+    from recolor_recipes import pack_rgb, unpack_rgb
+    matcher = matcher or PaletteMatcher(color_map, tolerance)
+
+    if image.mode == "P":
+        img = image.copy()
+        palette = np.array(img.getpalette(), dtype=np.uint8).reshape(-1, 3)
+        img.putpalette(unpack_rgb(matcher.resolve(pack_rgb(palette))).flatten().tolist())
+        return img
+
+    if digests is not None and cell_recolors is not None:
+        return recolor_cells(image, matcher, digests, cell_recolors)
+
     # Ensure image is RGBA to handle transparency correctly
-    img = image.convert("RGBA")
-    data = img.getdata()
-    
-    new_data = []
-    # Optimization: Local variable lookup
-    get_new_color = color_map.get
-    
-    for pixel in data:
-        # pixel is (r, g, b, a)
-        rgb = pixel[:3]
-        new_rgb = get_new_color(rgb)
-        
-        if new_rgb:
-            new_data.append(new_rgb + (pixel[3],))
-        else:
-            new_data.append(pixel)
-            
-    img.putdata(new_data)
+    pixels = np.array(image if image.mode == "RGBA" else image.convert("RGBA"))
+    recolor_pixels(pixels, matcher)
+    return Image.fromarray(pixels, "RGBA")
+
+@profiling.timed('decode')
+def load_for_recolor(path, indexed=False):
+    """Opens an image for recoloring, converting it to a palette-indexed image when requested and possible."""
+    from PIL import Image
+    img = Image.open(path)
+    img.load()
+    return index_for_recolor(img, path.name) if indexed else img
+
+@profiling.timed('decode')
+def decode_for_recolor(data):
+    """Decodes PNG bytes in their own mode, like load_for_recolor; the decode step of the mass recolor's skin_loader pipeline."""
+    import io
+    from PIL import Image
+    img = Image.open(io.BytesIO(data))
+    img.load()
     return img
 
+def index_for_recolor(img, name):
+    """Converts an image to palette-indexed form, or returns it unchanged if it can't be indexed."""
+    from spritesheet import Palette, index_image
+    indexed_img = index_image(img, Palette())
+    if indexed_img is not None:
+        return indexed_img
+    print(f"  Warning: '{name}' cannot be indexed; recoloring as RGBA.")
+    return img
+
+@profiling.timed('palette')
 def analyze_palette(files_to_process):
     """Generates a diagnostic image showing all colors used and their counts."""
+    from PIL import Image, ImageDraw, ImageFont
     color_counts = Counter()
     print("Analyzing palette...")
     
@@ -141,7 +255,24 @@ def main():
     parser.add_argument(
         '--mass-recolor',
         action='store_true',
-        help="Recolor all skins in the spritesheet directory from standard light to dark tones."
+        help="Recolor all skins in the spritesheet directory from standard light to dark tones, or with --recipe."
+    )
+    parser.add_argument(
+        '--recipe',
+        metavar='RECIPE_JSON',
+        help="Recolor with a recipe of hue-masked HSV/OKLab steps (see recolor_recipes.py) instead of --replace colors."
+    )
+    parser.add_argument(
+        '--indexed',
+        action='store_true',
+        help="Convert images to palette-indexed form before recoloring so only the palette table is rewritten."
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.0,
+        metavar='DISTANCE',
+        help="Also recolor pixels within this RGB distance of a source color, using the nearest one's replacement. Default is 0 (exact)."
     )
     parser.add_argument(
         '--analyze-head',
@@ -149,10 +280,34 @@ def main():
         help="Run palette diagnostic on a specific head skin."
     )
 
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="Time each stage (decode, recolor, palette, encode) and print a breakdown at exit."
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='TRACE_JSON',
+        help="Like --profile, and also write a Chrome trace (chrome://tracing, Perfetto) to this file."
+    )
+
     args = parser.parse_args()
 
-    if not args.replace and not args.palette and not args.mass_recolor and not args.analyze_head:
-        parser.error("You must specify --replace, --analyze-palette, --mass-recolor, or --analyze-head.")
+    if args.profile or args.trace:
+        profiling.enable(args.trace)
+
+    if not args.replace and not args.recipe and not args.palette and not args.mass_recolor and not args.analyze_head:
+        parser.error("You must specify --replace, --recipe, --analyze-palette, --mass-recolor, or --analyze-head.")
+
+    recipe = None
+    if args.recipe:
+        from recolor_recipes import load_recipe
+        try:
+            recipe = load_recipe(args.recipe)
+        except (OSError, ValueError) as e:
+            print(f"Error loading recipe '{args.recipe}': {e}")
+            sys.exit(1)
+        print(f"Recipe '{recipe.name}': {len(recipe.steps)} steps")
 
     # Parse color replacements
     color_map = {}
@@ -171,10 +326,14 @@ def main():
                 print(f"Error parsing color replacement '{replacement}': {e}")
                 sys.exit(1)
 
-    base_dir = Path(SPRITESHEET_DIRECTORY)
+    config = load_config()
+    base_dir = Path(config.spritesheet_directory)
+    if not base_dir.exists():
+        print(f"Error: Spritesheet directory not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
 
     if args.mass_recolor:
-        print("Starting mass recolor (Light -> Dark)...")
+        print(f"Starting mass recolor ({recipe.name if recipe else 'Light -> Dark'})...")
         try:
             # l1 = parse_hex_color(SKINTONE_LIGHT_1)
             # l2 = parse_hex_color(SKINTONE_LIGHT_2)
@@ -191,34 +350,65 @@ def main():
         output_base = Path.cwd() / "recolored_spritesheets"
         output_base.mkdir(exist_ok=True)
 
-        for item in base_dir.iterdir():
-            if item.is_dir():
-                skin_name = item.name
-                dest_dir_name = f"{skin_name}_skintone_2"
+        # Skins often carry byte-identical copies of a sheet (shared legs, copied torsos);
+        # each distinct file is recolored once and the result is copied for the rest.
+        recolored_by_digest = {}
+        matcher = recipe or PaletteMatcher(color_map, args.tolerance)
+        dest_suffix = recipe.name if recipe else "skintone_2"
+
+        # Cells repeated across sheets (shared legs, copied torso frames, shotgun reusing smg
+        # layouts) are recolored once, found through the frame index (see frame_index.py).
+        from frame_index import BODY_SPRITE_SIZE, FrameIndex, INDEX_FILENAME
+        skin_dirs = open_catalog(config).skin_dirs()
+        frame_index = None
+        cell_recolors = None
+        if not args.indexed:
+            frame_index = FrameIndex(Path.cwd() / INDEX_FILENAME).build(skin_dirs, config.head_spritesheet_directory)
+            cell_recolors = CellRecolors(frame_index.repeated_digests())
+
+        # Skins are read and decoded by skin_loader's worker threads a few skins ahead, while
+        # this loop recolors and encodes the skins that are already in memory.
+        import asyncio
+        from skin_loader import iter_skins
+
+        async def recolor_library():
+            skins = [(skin_name, skin_dirs[skin_name], None) for skin_name in sorted(skin_dirs)]
+            async for skin in iter_skins(skins, sheet_files=None, metadata_files={}, decode=decode_for_recolor):
+                dest_dir_name = f"{skin.name}_{dest_suffix}"
                 dest_dir = output_base / dest_dir_name
                 dest_dir.mkdir(exist_ok=True)
-
-                png_files = list(item.glob("*.png"))
-                if not png_files:
+                if not skin.sheets and not skin.errors:
                     continue
 
-                print(f"Processing '{skin_name}' -> '{dest_dir_name}' ({len(png_files)} files)")
-                for src_path in png_files:
+                print(f"Processing '{skin.name}' -> '{dest_dir_name}' ({len(skin.sheets) + len(skin.errors)} files)")
+                for error in skin.errors:
+                    print(f"  Error processing {error}")
+                for sheet_name, img in skin.sheets.items():
+                    src_path = skin.directory / sheet_name
                     try:
-                        img = Image.open(src_path)
-                        new_img = replace_colors(img, color_map)
-                        new_img.save(dest_dir / src_path.name)
+                        digest = hash_file(src_path)
+                        if digest in recolored_by_digest:
+                            shutil.copyfile(recolored_by_digest[digest], dest_dir / sheet_name)
+                            profiling.count('files reused')
+                            continue
+                        if args.indexed:
+                            img = index_for_recolor(img, sheet_name)
+                        digests = frame_index.cell_digests(src_path, BODY_SPRITE_SIZE) if frame_index is not None else None
+                        new_img = replace_colors(img, color_map, matcher=matcher, digests=digests, cell_recolors=cell_recolors)
+                        with profiling.stage('encode'):
+                            new_img.save(dest_dir / sheet_name)
+                        recolored_by_digest[digest] = dest_dir / sheet_name
+                        profiling.count('files recolored')
                     except Exception as e:
-                        print(f"  Error processing '{src_path.name}': {e}")
-        
+                        print(f"  Error processing '{sheet_name}': {e}")
+
+        asyncio.run(recolor_library())
+        if frame_index is not None:
+            frame_index.save()
         print(f"\nMass recolor complete. Output saved to '{output_base}'.")
         sys.exit(0)
     
-    head_dir = Path(HEAD_SPRITESHEET_DIRECTORY)
-    
-    if not base_dir.exists():
-        print(f"Error: Spritesheet directory not found at '{SPRITESHEET_DIRECTORY}'")
-        sys.exit(1)
+    head_dir = Path(config.head_spritesheet_directory)
 
     files_to_process = []
 
@@ -271,21 +461,24 @@ def main():
     if args.palette:
         analyze_palette(files_to_process)
 
-    if args.replace:
+    if args.replace or recipe:
         print(f"\nProcessing {len(files_to_process)} files for replacement...")
 
         # Process and save
+        matcher = recipe or PaletteMatcher(color_map, args.tolerance)
         for src_path in files_to_process:
             try:
-                img = Image.open(src_path)
+                img = load_for_recolor(src_path, args.indexed)
                 
-                new_img = replace_colors(img, color_map)
+                new_img = replace_colors(img, color_map, matcher=matcher)
                 
                 # Save to current working directory with prefix
                 output_name = f"recolored_{src_path.name}"
                 output_path = Path.cwd() / output_name
                 
-                new_img.save(output_path)
+                with profiling.stage('encode'):
+                    new_img.save(output_path)
+                profiling.count('files recolored')
                 print(f"  Saved '{output_name}'")
                 
             except Exception as e:
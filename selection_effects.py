@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from recolor_tool import parse_hex_color
+from skin_catalog import load_config, open_catalog
+
+# numpy, PIL and spritesheet are imported by the mask and sheet functions that run in the
+# workers, keeping --help fast.
+
+# --- Configuration ---
+DEFAULT_OUTPUT_DIRECTORY = 'selection_effects'
+
+# Every body sheet and the metadata file that addresses its cells. Effect sheets keep the
+# same grid, so the metadata is copied alongside unchanged.
+BODY_SHEETS = {
+    'Legs.png': 'LegSpriteData.xml',
+    'Torso.png': 'TorsoSpriteData.xml',
+    'pistol.png': 'pistolSpriteData.xml',
+    'smg.png': 'smgSpriteData.xml',
+    'rifle.png': 'rifleSpriteData.xml',
+    'shotgun.png': 'shotgunSpriteData.xml',
+}
+BODY_SPRITE_SIZE = (64, 64)
+HEAD_SPRITE_SIZE = (32, 32)
+
+EFFECTS = ('outline', 'shadow')
+DEFAULT_OUTLINE_COLOR = 'FFFFFF'
+DEFAULT_SHADOW_COLOR = '000000'
+DEFAULT_SHADOW_ALPHA = 128
+DEFAULT_SHADOW_OFFSET = (2, 2)
+
+
+def dilate(mask, radius=1, diagonal=True):
+    """
+    Grows an (N, h, w) boolean mask by `radius` pixels inside each cell, so silhouettes never
+    bleed into neighbouring cells. One shifted OR per neighbourhood offset, over all cells at once.
+    """
+    import numpy as np
+
+    count, height, width = mask.shape
+    padded = np.pad(mask, ((0, 0), (radius, radius), (radius, radius)))
+    out = np.zeros_like(mask)
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if not diagonal and abs(dx) + abs(dy) > radius:
+                continue
+            out |= padded[:, radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+    return out
+
+
+def shift(mask, offset):
+    """Moves an (N, h, w) boolean mask by (dx, dy) inside each cell; pixels pushed out are dropped."""
+    import numpy as np
+
+    dx, dy = offset
+    height, width = mask.shape[1:]
+    out = np.zeros_like(mask)
+    out[:, max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        mask[:, max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+    return out
+
+
+def fill(mask, rgba):
+    """Paints an (N, h, w) mask in one RGBA color over transparency."""
+    import numpy as np
+
+    cells = np.zeros(mask.shape + (4,), dtype=np.uint8)
+    cells[mask] = rgba
+    return cells
+
+
+def outline_cells(alpha, color, thickness=1):
+    """The ring of pixels within `thickness` of each silhouette, outside the sprite itself."""
+    return fill(dilate(alpha, thickness) & ~alpha, color)
+
+
+def shadow_cells(alpha, color, offset=DEFAULT_SHADOW_OFFSET):
+    """Each silhouette moved by `offset`, to be drawn beneath the sprite."""
+    return fill(shift(alpha, offset), color)
+
+
+def effect_sheets(image, sprite_size, effects):
+    """
+    Computes every requested effect for a whole sheet at once. `effects` maps an effect name to
+    a function taking the sheet's (N, h, w) alpha mask. Returns {name: image} on the sheet's grid.
+    """
+    from spritesheet import slice_atlas, unslice_atlas
+
+    alpha = slice_atlas(image, sprite_size)[..., 3] > 0
+    columns = -(-image.width // sprite_size[0])
+    return {name: unslice_atlas(func(alpha), columns, image.size) for name, func in effects.items()}
+
+
+def process_sheet(path, sprite_size, effects, output_paths):
+    """Writes one sheet's effect sheets to output_paths[effect name]."""
+    from PIL import Image
+
+    for name, sheet in effect_sheets(Image.open(path), sprite_size, effects).items():
+        output_paths[name].parent.mkdir(parents=True, exist_ok=True)
+        sheet.save(output_paths[name])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate outline and drop-shadow sheets from the alpha channel of every skin's sheets.")
+    parser.add_argument('skins', nargs='*', metavar='SKIN', help="Skins to process. Default is every skin.")
+    parser.add_argument('--effect', action='append', choices=EFFECTS, help="Effects to generate. Default is all of them.")
+    parser.add_argument('--thickness', type=int, default=1, help="Outline thickness in pixels. Default is 1.")
+    parser.add_argument('--outline-color', default=DEFAULT_OUTLINE_COLOR, metavar='HEX', help=f"Default is {DEFAULT_OUTLINE_COLOR}.")
+    parser.add_argument('--shadow-color', default=DEFAULT_SHADOW_COLOR, metavar='HEX', help=f"Default is {DEFAULT_SHADOW_COLOR}.")
+    parser.add_argument('--shadow-alpha', type=int, default=DEFAULT_SHADOW_ALPHA, help=f"Default is {DEFAULT_SHADOW_ALPHA}.")
+    parser.add_argument('--shadow-offset', type=int, nargs=2, default=DEFAULT_SHADOW_OFFSET, metavar=('DX', 'DY'), help="Shadow offset in pixels, y down. Default is 2 2.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIRECTORY, help=f"Output directory. Default is '{DEFAULT_OUTPUT_DIRECTORY}'.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="Sheets processed in parallel. Default is one per CPU.")
+    args = parser.parse_args()
+
+    try:
+        outline_color = parse_hex_color(args.outline_color) + (255,)
+        shadow_color = parse_hex_color(args.shadow_color) + (args.shadow_alpha,)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    all_effects = {
+        'outline': lambda alpha: outline_cells(alpha, outline_color, args.thickness),
+        'shadow': lambda alpha: shadow_cells(alpha, shadow_color, tuple(args.shadow_offset)),
+    }
+    effects = {name: all_effects[name] for name in args.effect or EFFECTS}
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    catalog = open_catalog(config, full=True)
+    skin_dirs = catalog.skin_dirs()
+    for skin_name in args.skins:
+        if skin_name not in skin_dirs:
+            print(f"Error: Unknown skin '{skin_name}'.")
+            sys.exit(1)
+
+    # Each effect gets a skin tree of its own ({effect}/{skin}/smg.png, {effect}/head/{skin}.png),
+    # so an effect's sheets load through Spritesheet exactly like the originals.
+    output_dir = Path(args.output)
+    jobs = []  # (source sheet, sprite size, {effect: output path})
+    for skin_name in args.skins or sorted(skin_dirs):
+        for sheet_name, metadata_name in BODY_SHEETS.items():
+            sheet_path = skin_dirs[skin_name] / sheet_name
+            if not sheet_path.is_file():
+                continue
+            jobs.append((sheet_path, BODY_SPRITE_SIZE, {name: output_dir / name / skin_name / sheet_name for name in effects}))
+            metadata_path = skin_dirs[skin_name] / metadata_name
+            if metadata_path.is_file():
+                for name in effects:
+                    (output_dir / name / skin_name).mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(metadata_path, output_dir / name / skin_name / metadata_name)
+        head_path = catalog.head_path(skin_name)
+        if head_path is not None:
+            jobs.append((head_path, HEAD_SPRITE_SIZE, {name: output_dir / name / 'head' / head_path.name for name in effects}))
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(process_sheet, path, sprite_size, effects, output_paths): path for path, sprite_size, output_paths in jobs}
+        for future, path in futures.items():
+            try:
+                future.result()
+            except (OSError, ValueError) as e:
+                print(f"Error: Could not process '{path}': {e}")
+                failed += 1
+    catalog.save()
+    print(f"Generated {', '.join(effects)} for {len(jobs) - failed} sheets in '{output_dir}'.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import argparse
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from skin_catalog import load_config, open_catalog
+
+# numpy, PIL and the sheet helpers built on them are imported where cells are decoded and
+# compared, so --help doesn't pay for them.
+
+# --- Configuration ---
+DEFAULT_OUTPUT_DIRECTORY = 'sheet_diffs'
+
+BODY_SHEETS = ('Legs.png', 'Torso.png', 'pistol.png', 'smg.png', 'rifle.png', 'shotgun.png')
+BODY_SPRITE_SIZE = (64, 64)
+HEAD_SPRITE_SIZE = (32, 32)
+
+# Heatmap colors: pixels that appeared or vanished (alpha changed) vs pixels repainted (RGB changed).
+ALPHA_CHANGE_COLOR = (255, 0, 0)
+COLOR_CHANGE_COLOR = (255, 200, 0)
+
+# Old | new | heatmap triptychs per row of the contact sheet.
+HEATMAP_COLUMNS = 4
+
+
+def pad_grid(cells, columns, grid_shape):
+    """
+    Places the (N, h, w, 4) cells of a sheet `columns` wide at the same (row, column) of a
+    (rows, columns) grid at least as large, padding with empty cells. Returns the grid's cells row-major.
+    """
+    import numpy as np
+
+    grid_rows, grid_columns = grid_shape
+    cells = cells.reshape(-1, columns, *cells.shape[1:])
+    cells = np.pad(cells, ((0, grid_rows - len(cells)), (0, grid_columns - columns), (0, 0), (0, 0), (0, 0)))
+    return cells.reshape(grid_rows * grid_columns, *cells.shape[2:])
+
+
+def diff_cells(old, new):
+    """
+    Compares two equally sized (N, h, w, 4) cell arrays at once. Returns (alpha_changed,
+    color_changed), two (N, h, w) masks: pixels whose alpha differs, and pixels visible in
+    both whose RGB differs. Hidden RGB under zero alpha is ignored.
+    """
+    alpha_changed = old[..., 3] != new[..., 3]
+    color_changed = (old[..., 3] > 0) & (new[..., 3] > 0) & (old[..., :3] != new[..., :3]).any(axis=-1)
+    return alpha_changed, color_changed
+
+
+def changed_cells(alpha_changed, color_changed, columns):
+    """
+    Lists every changed cell with its grid position, changed pixel counts and class:
+    'alpha' (silhouette only), 'color' (repaint only) or 'both'.
+    """
+    import numpy as np
+
+    alpha_counts = alpha_changed.sum(axis=(1, 2))
+    color_counts = color_changed.sum(axis=(1, 2))
+    changes = []
+    for cell in np.flatnonzero(alpha_counts + color_counts).tolist():
+        alpha, color = int(alpha_counts[cell]), int(color_counts[cell])
+        changes.append({
+            'cell': cell,
+            'row': cell // columns,
+            'column': cell % columns,
+            'class': 'both' if alpha and color else 'alpha' if alpha else 'color',
+            'alpha_pixels': alpha,
+            'color_pixels': color,
+        })
+    return changes
+
+
+def heatmap_cells(cells, alpha_changed, color_changed):
+    """Dims the cells to gray and paints the changed pixels over them in the heatmap colors."""
+    import numpy as np
+
+    gray = (cells[..., :3].astype(np.uint16).sum(axis=-1) // 6 + 128).astype(np.uint8)
+    heat = np.stack([gray, gray, gray, np.where(cells[..., 3] > 0, 255, 64).astype(np.uint8)], axis=-1)
+    heat[color_changed] = COLOR_CHANGE_COLOR + (255,)
+    heat[alpha_changed] = ALPHA_CHANGE_COLOR + (255,)
+    return heat
+
+
+def diff_sheets(old_image, new_image, sprite_size):
+    """
+    Diffs two sheets cell by cell, matching cells by (row, column). Returns (changes, heatmap)
+    where heatmap is a contact sheet of old | new | heatmap for every changed cell, or None when
+    nothing changed. Cell numbers count row-major across the wider sheet's columns.
+    """
+    import numpy as np
+    from sprite_inspector import contact_sheet
+    from spritesheet import slice_atlas
+
+    old_cells, new_cells = slice_atlas(old_image, sprite_size), slice_atlas(new_image, sprite_size)
+    # A sheet that grew or shrank, in either direction, compares its extra cells against empty ones.
+    old_columns, new_columns = (-(-image.width // sprite_size[0]) for image in (old_image, new_image))
+    columns = max(old_columns, new_columns)
+    rows = max(len(old_cells) // old_columns, len(new_cells) // new_columns)
+    old_cells, new_cells = pad_grid(old_cells, old_columns, (rows, columns)), pad_grid(new_cells, new_columns, (rows, columns))
+    alpha_changed, color_changed = diff_cells(old_cells, new_cells)
+    changes = changed_cells(alpha_changed, color_changed, columns)
+    if not changes:
+        return changes, None
+
+    picked = [c['cell'] for c in changes]
+    heat = heatmap_cells(new_cells[picked], alpha_changed[picked], color_changed[picked])
+    triptychs = np.concatenate([old_cells[picked], new_cells[picked], heat], axis=2)
+    labels = [f"{c['cell']} {c['class']}" for c in changes]
+    return changes, contact_sheet(triptychs, columns=HEATMAP_COLUMNS, labels=labels)
+
+
+def read_revision(path, rev):
+    """Reads a file's blob at a git revision, e.g. 'HEAD', as a PIL image."""
+    from PIL import Image
+
+    path = Path(path).resolve()
+    result = subprocess.run(['git', 'show', f'{rev}:./{path.name}'], cwd=path.parent, capture_output=True)
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode(errors='replace').strip())
+    return Image.open(io.BytesIO(result.stdout))
+
+
+def sprite_size_for(path, head_dir):
+    return HEAD_SPRITE_SIZE if Path(path).resolve().parent == Path(head_dir).resolve() else BODY_SPRITE_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show which cells changed between two sheets, two skins, or a sheet and its git revision.")
+    parser.add_argument('sources', nargs='+', metavar='SOURCE', help="OLD.png NEW.png; SHEET.png with --rev; or SKIN_A SKIN_B with --skins.")
+    parser.add_argument('--skins', action='store_true', help="Compare every sheet, and the head, of two skins.")
+    parser.add_argument('--sheet', action='append', metavar='NAME', help="With --skins, only compare these sheets (e.g. smg.png).")
+    parser.add_argument('--rev', metavar='REV', help="Compare SHEET.png against its blob at a git revision, e.g. HEAD.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIRECTORY, help=f"Directory for heatmap contact sheets. Default is '{DEFAULT_OUTPUT_DIRECTORY}'.")
+    parser.add_argument('--json', metavar='PATH', help="Write the changed cells as JSON to PATH ('-' for stdout).")
+    args = parser.parse_args()
+
+    expected = 1 if args.rev else 2
+    if len(args.sources) != expected or (args.rev and args.skins):
+        parser.error("Give OLD.png NEW.png, SHEET.png --rev REV, or SKIN_A SKIN_B --skins.")
+
+    config = load_config()
+    pairs = []  # (label, old loader, new path, sprite size)
+    if args.skins:
+        catalog = open_catalog(config, full=True)
+        for skin_name in args.sources:
+            if skin_name not in catalog.skins:
+                print(f"Error: Unknown skin '{skin_name}'.")
+                sys.exit(1)
+        old_name, new_name = args.sources
+        for sheet_name in args.sheet or BODY_SHEETS:
+            old_path, new_path = catalog.root / old_name / sheet_name, catalog.root / new_name / sheet_name
+            if old_path.is_file() and new_path.is_file():
+                pairs.append((f'{old_name}_{new_name}_{Path(sheet_name).stem}', old_path, new_path, BODY_SPRITE_SIZE))
+        old_head, new_head = catalog.head_path(old_name), catalog.head_path(new_name)
+        if not args.sheet and old_head is not None and new_head is not None:
+            pairs.append((f'{old_name}_{new_name}_head', old_head, new_head, HEAD_SPRITE_SIZE))
+    else:
+        new_path = Path(args.sources[-1])
+        old_source = args.rev or Path(args.sources[0])
+        for path in {new_path} if args.rev else {old_source, new_path}:
+            if not path.is_file():
+                print(f"Error: Sheet not found at '{path}'")
+                sys.exit(1)
+        label = f'{new_path.stem}_{args.rev}' if args.rev else f'{old_source.stem}_{new_path.stem}'
+        pairs.append((label, old_source, new_path, sprite_size_for(new_path, config.head_spritesheet_directory)))
+
+    from PIL import Image
+
+    output_dir = Path(args.output)
+    report = {}
+    for label, old_source, new_path, sprite_size in pairs:
+        try:
+            old_image = read_revision(new_path, old_source) if args.rev else Image.open(old_source)
+            changes, heatmap = diff_sheets(old_image, Image.open(new_path), sprite_size)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not diff '{new_path}': {e}")
+            sys.exit(1)
+        entry = report[label] = {'old': str(old_source), 'new': str(new_path), 'changes': changes}
+        if heatmap is not None:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            entry['heatmap'] = str(output_dir / f'{label}_diff.png')
+            heatmap.save(entry['heatmap'])
+
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+        return
+    for label, entry in report.items():
+        changes = entry['changes']
+        classes = {name: sum(1 for c in changes if c['class'] == name) for name in ('alpha', 'color', 'both')}
+        print(f"{label}: {len(changes)} changed cells ({classes['alpha']} alpha-only, {classes['color']} color-only, {classes['both']} both)")
+        if changes:
+            print(f"  cells: {', '.join(str(c['cell']) for c in changes)}")
+            print(f"  heatmap: '{entry['heatmap']}'")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Saved report to '{args.json}'")
+
+
+if __name__ == '__main__':
+    main()
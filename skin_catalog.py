@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from png_probe import PngHeader, read_png_header
+
+# --- Configuration ---
+# Defaults; override them per machine with a config file or environment variables (see load_config).
+SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets'
+
+HEAD_SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets/head'
+
+EXCLUDE_SKINS = ['cyber', 'generic64', 'gibs', 'head']
+
+# Standalone weapon sprites ('{weapon}.png') drawn on the character's back.
+WEAPON_SPRITE_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/weapons'
+
+# Weapons that can be drawn slung on the back, from WEAPON_SPRITE_DIRECTORY/{weapon}.png.
+BACK_WEAPONS = ('pistol', 'smg', 'rifle', 'shotgun')
+
+CATALOG_FILENAME = '.skin_catalog.json'
+CATALOG_VERSION = 2
+
+CONFIG_FILENAME = 'skin_tools.json'
+CONFIG_PATH_VARIABLE = 'SKIN_TOOLS_CONFIG'
+
+# Environment variables, by config field. EXCLUDE_SKINS is a comma-separated list.
+CONFIG_VARIABLES = {
+    'spritesheet_directory': 'SPRITESHEET_DIRECTORY',
+    'head_spritesheet_directory': 'HEAD_SPRITESHEET_DIRECTORY',
+    'exclude_skins': 'EXCLUDE_SKINS',
+    'weapon_sprite_directory': 'WEAPON_SPRITE_DIRECTORY',
+    'catalog_path': 'SKIN_CATALOG_PATH',
+}
+
+CATALOG_SUFFIXES = ('.png', '.xml')
+
+
+@dataclass
+class CatalogConfig:
+    spritesheet_directory: str = SPRITESHEET_DIRECTORY
+    head_spritesheet_directory: str = HEAD_SPRITESHEET_DIRECTORY
+    exclude_skins: list = field(default_factory=lambda: list(EXCLUDE_SKINS))
+    weapon_sprite_directory: str = WEAPON_SPRITE_DIRECTORY
+    catalog_path: str = CATALOG_FILENAME
+
+
+def load_config(path=None):
+    """
+    Builds the tools' configuration from, in increasing priority: the defaults above, a JSON
+    config file, and environment variables. The config file is `path`, else $SKIN_TOOLS_CONFIG,
+    else skin_tools.json in the working directory or next to the scripts, if either exists.
+    """
+    config = CatalogConfig()
+    if path is None:
+        path = os.environ.get(CONFIG_PATH_VARIABLE)
+    if path is None:
+        path = next((p for p in (Path.cwd() / CONFIG_FILENAME, Path(__file__).parent / CONFIG_FILENAME) if p.is_file()), None)
+    if path is not None:
+        try:
+            values = json.loads(Path(path).read_text())
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable config file '{path}': {e}")
+            values = {}
+        for name, value in values.items():
+            if name in CONFIG_VARIABLES:
+                setattr(config, name, value)
+            else:
+                print(f"Warning: Unknown setting '{name}' in config file '{path}'.")
+
+    for name, variable in CONFIG_VARIABLES.items():
+        value = os.environ.get(variable)
+        if value is not None:
+            setattr(config, name, [v.strip() for v in value.split(',') if v.strip()] if name == 'exclude_skins' else value)
+    return config
+
+
+class SkinCatalog:
+    """
+    Lists the skins in the spritesheet tree with the size, mtime and PNG header of every sheet.
+
+    Only file metadata and IHDR chunks are read; no pixel data is ever decoded. Entries are
+    cached in an index file keyed by mtime and size, so a refresh re-probes only the files
+    that changed since the last one. Directory listings are cached by directory mtime, so
+    refresh_skins() can answer "which skins exist" with a single stat of the root.
+
+    header() may be called from several threads at once (validate_skins probes with it from
+    its worker pool): the file entries are only read and written under a lock, while the
+    header reads themselves run in parallel.
+    """
+
+    def __init__(self, root, head_dir, exclude=(), index_path=None):
+        self.root = Path(root)
+        self.head_dir = Path(head_dir)
+        self.exclude = set(exclude)
+        self.index_path = Path(index_path) if index_path else None
+        self.files = {}  # str(path) -> {'mtime_ns', 'size', 'png': {'width', 'height', 'bit_depth', 'color_type'} | None}
+        self.skins = {}  # skin name -> [file name, ...]
+        self.heads = {}  # skin name -> head sheet file name
+        self.dirs = {}   # str(directory) -> mtime_ns of its cached listing
+        self.dirty = False
+        self._lock = threading.Lock()
+        if self.index_path is not None and self.index_path.is_file():
+            try:
+                cached = json.loads(self.index_path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable skin catalog '{self.index_path}': {e}")
+                cached = {}
+            # A catalog built for another tree or exclude list would list the wrong skins.
+            if (cached.get('version') == CATALOG_VERSION and cached.get('root') == str(self.root)
+                    and cached.get('head_dir') == str(self.head_dir) and set(cached.get('exclude', [])) == self.exclude):
+                self.files = cached.get('files', {})
+                self.skins = cached.get('skins', {})
+                self.heads = cached.get('heads', {})
+                self.dirs = cached.get('dirs', {})
+
+    def file_entry(self, path, stat):
+        """Returns the cached entry for a file, re-reading its PNG header only if its mtime or size changed."""
+        with self._lock:
+            entry = self.files.get(path)
+        if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            png = None
+            if path.endswith('.png'):
+                try:
+                    header = read_png_header(path)
+                    png = {'width': header.width, 'height': header.height, 'bit_depth': header.bit_depth, 'color_type': header.color_type}
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Could not read PNG header of '{path}': {e}")
+            entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'png': png}
+            with self._lock:
+                self.files[path] = entry
+                self.dirty = True
+        return entry
+
+    def directory_changed(self, directory):
+        """
+        Returns True (and remembers the new mtime) if a directory's listing may have changed since
+        it was cached. A new mtime alone doesn't mark the catalog dirty; only a listing that
+        actually differs does, so touching a directory never rewrites the index.
+        """
+        mtime_ns = os.stat(directory).st_mtime_ns
+        if self.dirs.get(str(directory)) == mtime_ns:
+            return False
+        self.dirs[str(directory)] = mtime_ns
+        return True
+
+    def list_directory(self, directory):
+        """Returns the sorted names of the sheets and metadata files directly inside a directory."""
+        with os.scandir(directory) as entries:
+            return sorted(entry.name for entry in entries if entry.name.endswith(CATALOG_SUFFIXES) and entry.is_file())
+
+    def refresh_skins(self):
+        """
+        Updates the list of skins with one stat of the root directory, re-listing it only if it
+        changed. Skin contents aren't checked; use refresh() or header() for that.
+        """
+        if not self.directory_changed(self.root):
+            return self
+        with os.scandir(self.root) as entries:
+            names = sorted(entry.name for entry in entries if entry.name not in self.exclude and entry.is_dir())
+        if names != list(self.skins):
+            self.skins = {name: self.skins.get(name) for name in names}
+            self.dirty = True
+        return self
+
+    def refresh(self):
+        """
+        Brings the whole catalog up to date: re-lists only directories whose mtime changed and
+        re-reads headers only of files whose mtime or size changed. Every file is still stat'ed,
+        since editing a sheet in place doesn't touch its directory.
+        """
+        self.refresh_skins()
+        for skin_name, names in self.skins.items():
+            directory = self.root / skin_name
+            if self.directory_changed(directory) or names is None:
+                listing = self.list_directory(directory)
+                if listing != names:
+                    self.skins[skin_name] = listing
+                    self.dirty = True
+
+        if self.head_dir.is_dir() and self.directory_changed(self.head_dir):
+            heads = {name[:-len('.png')]: name for name in self.list_directory(self.head_dir) if name.endswith('.png')}
+            if heads != self.heads:
+                self.heads = heads
+                self.dirty = True
+
+        live = {str(self.root / skin / name) for skin, names in self.skins.items() for name in names}
+        live.update(str(self.head_dir / name) for name in self.heads.values())
+        for path in live:
+            self.file_entry(path, os.stat(path))
+        if len(self.files) != len(live):
+            self.files = {path: entry for path, entry in self.files.items() if path in live}
+            self.dirty = True
+        return self
+
+    def skin_dirs(self):
+        """Returns {skin name: skin directory}, the same mapping the tools build with iterdir."""
+        return {name: self.root / name for name in self.skins}
+
+    def skin_files(self, skin_name):
+        """Returns {file name: entry} for a skin's sheets and metadata files. Call refresh() first."""
+        return {name: self.files[str(self.root / skin_name / name)] for name in self.skins.get(skin_name) or []}
+
+    def head_path(self, skin_name):
+        """Returns the path of a skin's head sheet, or None if there isn't one."""
+        name = self.heads.get(skin_name)
+        return self.head_dir / name if name else None
+
+    def header(self, path):
+        """Returns the PngHeader of a sheet, re-reading it only if the file changed since it was catalogued."""
+        entry = self.file_entry(str(path), os.stat(path))
+        if entry['png'] is None:
+            raise ValueError(f"'{path}' is not a PNG file.")
+        return PngHeader(**entry['png'])
+
+    def save(self):
+        """Writes the index file if anything changed. A read-only location only costs the cache."""
+        if self.index_path is None or not self.dirty:
+            return
+        with self._lock:
+            text = json.dumps({
+                'version': CATALOG_VERSION, 'root': str(self.root), 'head_dir': str(self.head_dir), 'exclude': sorted(self.exclude),
+                'dirs': self.dirs, 'files': self.files, 'skins': self.skins, 'heads': self.heads,
+            })
+        try:
+            self.index_path.write_text(text)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save skin catalog '{self.index_path}': {e}")
+
+
+def open_catalog(config=None, full=False):
+    """
+    Opens the configured catalog and refreshes it: just the skin list by default, which costs one
+    stat however large the tree is, or every file with full=True. The index is only written
+    when the refresh found new, removed or edited entries, so opening an unchanged tree (e.g.
+    for a tool's --help choices) leaves the file alone.
+    """
+    config = config or load_config()
+    catalog = SkinCatalog(config.spritesheet_directory, config.head_spritesheet_directory, config.exclude_skins, config.catalog_path)
+    if full:
+        catalog.refresh()
+    else:
+        catalog.refresh_skins()
+    catalog.save()
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List every skin with its sheet sizes and formats, reading only PNG headers.")
+    parser.add_argument('skins', nargs='*', metavar='SKIN', help="Skins to show in detail. Default is a one-line summary per skin.")
+    parser.add_argument('--json', metavar='PATH', help="Write the catalog as JSON to PATH.")
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the cached catalog and re-probe every file.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    if args.rebuild and Path(config.catalog_path).is_file():
+        Path(config.catalog_path).unlink()
+    catalog = open_catalog(config, full=True)
+
+    for skin_name in args.skins:
+        if skin_name not in catalog.skins:
+            print(f"Error: Unknown skin '{skin_name}'.")
+            sys.exit(1)
+
+    if args.skins:
+        for skin_name in args.skins:
+            print(f"{skin_name}:")
+            files = catalog.skin_files(skin_name)
+            head_path = catalog.head_path(skin_name)
+            if head_path is not None:
+                files[f'head/{head_path.name}'] = catalog.files[str(head_path)]
+            for name, entry in files.items():
+                png = entry['png']
+                details = f"{png['width']}x{png['height']} {PngHeader(**png).color_type_name} {png['bit_depth']}-bit" if png else ''
+                print(f"  {name:<28} {entry['size'] / 1024:>8.1f} KiB  {details}")
+    else:
+        print(f"{'skin':<24} {'sheets':>6} {'xml':>4} {'head':>5} {'KiB':>9}")
+        for skin_name, names in catalog.skins.items():
+            files = catalog.skin_files(skin_name)
+            print(f"{skin_name:<24} {sum(n.endswith('.png') for n in names):>6} {sum(n.endswith('.xml') for n in names):>4} "
+                  f"{'yes' if skin_name in catalog.heads else 'no':>5} {sum(e['size'] for e in files.values()) / 1024:>9.1f}")
+        print(f"\n{len(catalog.skins)} skins, {len(catalog.heads)} head sheets.")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({'skins': {name: catalog.skin_files(name) for name in catalog.skins}, 'heads': catalog.heads}, indent=2))
+        print(f"Saved catalog to '{args.json}'")
+
+
+if __name__ == '__main__':
+    main()
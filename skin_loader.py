@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import io
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from PIL import Image
+
+from skin_catalog import load_config, open_catalog
+from spritesheet import load_leg_metadata_at_path, load_metadata_at_path
+
+# --- Configuration ---
+# Body sheets and metadata files of a skin directory, loaded when present.
+SHEET_FILES = ('Legs.png', 'Torso.png', 'pistol.png', 'smg.png', 'rifle.png', 'shotgun.png')
+METADATA_FILES = {
+    'LegSpriteData.xml': load_leg_metadata_at_path,
+    'TorsoSpriteData.xml': load_metadata_at_path,
+    'pistolSpriteData.xml': load_metadata_at_path,
+    'smgSpriteData.xml': load_metadata_at_path,
+    'rifleSpriteData.xml': load_metadata_at_path,
+    'shotgunSpriteData.xml': load_metadata_at_path,
+}
+
+# Skins loading or loaded-but-not-yet-consumed at any time.
+DEFAULT_CONCURRENCY = 4
+
+# Threads reading and decoding files for all skins in flight.
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class LoadedSkin:
+    """One skin with every sheet decoded (to RGBA by default) and every metadata file parsed."""
+    name: str
+    directory: Path
+    sheets: dict = field(default_factory=dict)    # filename -> decoded image
+    metadata: dict = field(default_factory=dict)  # filename -> [SpriteMetadata] / [LegSpriteMetadata]
+    head: Image.Image | None = None
+    errors: list = field(default_factory=list)    # one message per file that failed to load
+
+
+def decode_sheet(data):
+    """Decodes PNG bytes to RGBA. Runs in an executor: PIL decoding releases the GIL."""
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img.convert("RGBA")
+
+
+async def load_sheet(loop, executor, path, decode=decode_sheet):
+    data = await loop.run_in_executor(executor, path.read_bytes)
+    return await loop.run_in_executor(executor, decode, data)
+
+
+async def load_skin(name, skin_dir, head_path, executor, sheet_files=SHEET_FILES, metadata_files=METADATA_FILES, decode=decode_sheet):
+    """
+    Loads the sheets, metadata files and the head of one skin concurrently. Files that are
+    missing or unreadable are recorded in LoadedSkin.errors instead of failing the skin.
+    `sheet_files` of None loads every PNG in the skin directory; `decode` turns a sheet's PNG
+    bytes into the image stored in LoadedSkin.sheets and head.
+    """
+    loop = asyncio.get_running_loop()
+    skin = LoadedSkin(name, Path(skin_dir))
+    if sheet_files is None:
+        sheet_files = sorted(path.name for path in skin.directory.glob('*.png'))
+    jobs = {}  # (kind, filename) -> awaitable
+    for sheet_name in sheet_files:
+        if (skin.directory / sheet_name).is_file():
+            jobs[('sheet', sheet_name)] = load_sheet(loop, executor, skin.directory / sheet_name, decode)
+    for metadata_name, loader in metadata_files.items():
+        if (skin.directory / metadata_name).is_file():
+            jobs[('metadata', metadata_name)] = loop.run_in_executor(executor, loader, skin.directory / metadata_name)
+    if head_path is not None:
+        jobs[('head', head_path.name)] = load_sheet(loop, executor, head_path, decode)
+
+    results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+    for (kind, filename), result in zip(jobs, results):
+        if isinstance(result, (OSError, ValueError, ET.ParseError)):
+            skin.errors.append(f"'{filename}': {result}")
+        elif isinstance(result, BaseException):
+            raise result
+        elif kind == 'sheet':
+            skin.sheets[filename] = result
+        elif kind == 'metadata':
+            skin.metadata[filename] = result
+        else:
+            skin.head = result
+    return skin
+
+
+async def iter_skins(skins, concurrency=DEFAULT_CONCURRENCY, workers=DEFAULT_WORKERS, **load_options):
+    """
+    Yields LoadedSkins in the order they finish loading. `skins` is an iterable of
+    (name, skin directory, head path or None); `load_options` (sheet_files, metadata_files,
+    decode) are passed on to load_skin.
+
+    At most `concurrency` skins are in flight. A new skin only starts loading when the consumer
+    asks for the next one, so a slow downstream stage holds back reading instead of letting
+    decoded sheets pile up in memory. Closing the generator early cancels the skins in flight.
+    """
+    skins = iter(skins)
+    pending = set()
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    def start_next():
+        entry = next(skins, None)
+        if entry is not None:
+            pending.add(asyncio.ensure_future(load_skin(*entry, executor, **load_options)))
+
+    try:
+        for _ in range(concurrency):
+            start_next()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+                start_next()
+    finally:
+        for task in pending:
+            task.cancel()
+        # Waiting for reads and decodes already running would block the event loop on an early close.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def catalog_skins(catalog, names=None):
+    """
+    (name, directory, head path) for the given skins, or every skin, of a SkinCatalog.
+    Head paths are only known once the catalog is fully refreshed (open_catalog(full=True)).
+    """
+    skin_dirs = catalog.skin_dirs()
+    return [(name, skin_dirs[name], catalog.head_path(name)) for name in names or sorted(skin_dirs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the whole skin library with the async bulk loader and report per-skin load results.")
+    parser.add_argument('skins', nargs='*', metavar='SKIN', help="Skins to load. Default is every skin.")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f"Skins in flight at once. Default is {DEFAULT_CONCURRENCY}.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f"Threads reading and decoding files. Default is {DEFAULT_WORKERS}.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    catalog = open_catalog(config, full=True)
+    skin_dirs = catalog.skin_dirs()
+    for skin_name in args.skins:
+        if skin_name not in skin_dirs:
+            print(f"Error: Unknown skin '{skin_name}'.")
+            sys.exit(1)
+
+    async def run():
+        start = time.perf_counter()
+        first = None
+        count = failed = 0
+        async for skin in iter_skins(catalog_skins(catalog, args.skins), args.concurrency, args.workers):
+            first = first or time.perf_counter() - start
+            count += 1
+            failed += bool(skin.errors)
+            print(f"{skin.name}: {len(skin.sheets)} sheets, {len(skin.metadata)} metadata files{', head' if skin.head else ''}")
+            for error in skin.errors:
+                print(f"  Error: {error}")
+        total = time.perf_counter() - start
+        print(f"\nLoaded {count} skins in {total:.2f}s (first ready after {first or 0:.2f}s); {failed} with errors.")
+
+    asyncio.run(run())
+    catalog.save()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,32 +2,43 @@ from pathlib import Path
 import argparse
 import math
 import sys
+import time
 from dataclasses import dataclass, field
-from PIL import Image
-import xml.etree.ElementTree as ET
 from indexes import *
 
-from spritesheet import Spritesheet
+import profiling
+from buildcache import BuildCache, BUILD_CACHE_FILENAME
+from skin_catalog import BACK_WEAPONS, load_config, open_catalog
+
+# PIL, ElementTree and the spritesheet and preview modules are imported by the functions that
+# render, so --help and the skin listing (e.g. through djtools.py) start without loading them.
 
 # --- Configuration ---
-SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets'
+# Spritesheet paths and excluded skins come from skin_catalog.load_config.
+MAX_SPRITE_COLUMNS = 10
 
-HEAD_SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets/head'
+# Map color names to RGBA values
+BACKGROUND_COLORS = {
+    'white': (255, 255, 255, 255),
+    'black': (0, 0, 0, 255),
+    'transparent': (0, 0, 0, 0)
+}
 
-EXCLUDE_SKINS = ['cyber', 'generic64', 'gibs', 'head']
+# Source files whose contents affect every rendered output: the index tables and the renderer itself.
+RENDERER_SOURCE_PATHS = [Path(__file__).parent / name for name in ('indexes.py', 'spritesheet.py', 'sprite-diagnostic.py')]
 
-MAX_SPRITE_COLUMNS = 10
+# Seconds between mtime polls in --watch mode.
+WATCH_POLL_INTERVAL = 0.25
 
 
 def main():
-    spritesheet_path = Path(SPRITESHEET_DIRECTORY)
-
-    if not spritesheet_path.is_dir():
-        print(f"Error: The base spritesheet directory was not found at '{SPRITESHEET_DIRECTORY}'")
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
         sys.exit(1)
 
     # Get available directory names to use for validation and listing
-    available_dirs = {d.name: d for d in spritesheet_path.iterdir() if d.is_dir() and d.name not in EXCLUDE_SKINS}
+    available_dirs = open_catalog(config).skin_dirs()
     available_dir_names = sorted(available_dirs.keys())
 
     parser = argparse.ArgumentParser(
@@ -62,92 +73,344 @@ def main():
         action='store_true',
         help="If set, writes the leg, torso, and head index on each generated sprite."
     )
+    parser.add_argument(
+        '--indexed',
+        action='store_true',
+        help="Load sheets as palette-indexed images and composite in index space to save memory."
+    )
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help="Composite pixel-identical frames only once, keyed by the cell digests of the frame index (see frame_index.py)."
+    )
+    parser.add_argument(
+        '--back-weapon',
+        choices=BACK_WEAPONS,
+        help="Draw this weapon slung on the back, placed by the weaponBack* metadata, on every sheet not already holding it."
+    )
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help="Batch mode: build diagnostics for every skin directory (legs, torso and head from the same skin)."
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help="List the outputs that are out of date and would be rebuilt, without rendering anything."
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="Rebuild every output, ignoring the build cache."
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help="Keep running and re-render only the sheets affected when an input PNG or XML changes."
+    )
+    parser.add_argument(
+        '--export-animations',
+        choices=['apng', 'gif'],
+        help="Instead of static grids, write one animated preview per weapon, animation and direction."
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="Time each pipeline stage (decode, slice, xml, composite, grid, encode) and print a breakdown at exit."
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='TRACE_JSON',
+        help="Like --profile, and also write a Chrome trace (chrome://tracing, Perfetto) to this file."
+    )
     args = parser.parse_args()
+    if args.watch and (args.all or args.export_animations):
+        parser.error("--watch re-renders one --legs/--torso/--head combination and can't be combined with --all or --export-animations.")
+
+    if args.profile or args.trace:
+        profiling.enable(args.trace)
+
+    if args.back_weapon:
+        from spritesheet import weapon_back_sprite_path
+        if not weapon_back_sprite_path(args.back_weapon).is_file():
+            print(f"Error: The back weapon sprite was not found at '{weapon_back_sprite_path(args.back_weapon)}'")
+            sys.exit(1)
+
+    cache = BuildCache(Path.cwd() / BUILD_CACHE_FILENAME)
+    if args.force:
+        cache.outputs = {}
 
+    # Digests of sheets the index already knows are reused; new or edited sheets are hashed and saved back.
+    frame_index = None
+    if args.dedup:
+        from frame_index import FrameIndex, INDEX_FILENAME
+        frame_index = FrameIndex(Path.cwd() / INDEX_FILENAME)
+
+    if args.all:
+        for skin_name in available_dir_names:
+            try:
+                generate_diagnostic(available_dirs, skin_name, skin_name, skin_name, args.color, args.show_indices, args.indexed, cache, args.dry_run, frame_index, args.back_weapon)
+            except (AttributeError, IndexError) as e:
+                # Spritesheet reports missing files itself; keep going with the rest of the batch.
+                print(f"Error: Could not build diagnostics for '{skin_name}': {e}")
     # If any part is specified, all parts must be specified.
-    if any([args.legs, args.torso, args.head]):
+    elif any([args.legs, args.torso, args.head]):
         if not all([args.legs, args.torso, args.head]):
             print("Error: To generate a character, you must specify all three parts: --legs, --torso, and --head.")
             print("Please provide values for the missing arguments.")
             sys.exit(1)
-        generate_diagnostic(available_dirs, args.legs, args.torso, args.head, args.color, args.show_indices)
+        if args.export_animations:
+            export_animations(available_dirs, args.legs, args.torso, args.head, args.color, args.export_animations, args.indexed, frame_index)
+        elif args.watch:
+            watch_diagnostic(available_dirs, args.legs, args.torso, args.head, args.color, args.show_indices, args.indexed, frame_index, args.back_weapon)
+        else:
+            generate_diagnostic(available_dirs, args.legs, args.torso, args.head, args.color, args.show_indices, args.indexed, cache, args.dry_run, frame_index, args.back_weapon)
     else:
         # Default behavior: list all available directories and exit.
         print("No body parts specified. Run with -h for options or provide parts to combine (e.g., --legs marine --torso marine --head marine).")
-        print(f"Available spritesheet directories in '{SPRITESHEET_DIRECTORY}':")
+        print(f"Available spritesheet directories in '{config.spritesheet_directory}':")
         for dir_name in available_dir_names:
             print(f"  - {dir_name}")
 
-def generate_diagnostic(available_dirs, leg_skin_name, torso_skin_name, head_skin_name, bg_color, show_indices):
+    if frame_index is not None:
+        frame_index.save()
+
+def generate_diagnostic(available_dirs, leg_skin_name, torso_skin_name, head_skin_name, bg_color, show_indices, indexed=False, cache=None, dry_run=False, frame_index=None, back_weapon=None):
+    """
+    Renders every diagnostic sheet for one legs/torso/head combination.
+
+    With a BuildCache, only outputs whose inputs or flags changed since they were last
+    built are rendered, and the Spritesheet isn't loaded at all when nothing is stale.
+    With dry_run, the stale outputs are listed instead of rendered.
+    Returns the loaded Spritesheet, or None if nothing was rendered.
+    """
+    from spritesheet import Spritesheet, spritesheet_input_paths
+    skin_names = (leg_skin_name, torso_skin_name, head_skin_name)
+    outputs = diagnostic_outputs()
+
+    if cache is not None:
+        input_paths = spritesheet_input_paths(available_dirs[leg_skin_name], available_dirs[torso_skin_name], head_skin_name)
+        flags = {'bg_color': bg_color, 'show_indices': show_indices, 'indexed': indexed, 'max_cols': MAX_SPRITE_COLUMNS}
+        signatures = {output: output_signature(cache, input_paths, output, flags, back_weapon) for output in outputs}
+        outputs = [output for output in outputs if cache.is_stale(diagnostic_filename(output, skin_names, back_weapon), signatures[output])]
+
+    if dry_run:
+        for output in outputs:
+            filename = diagnostic_filename(output, skin_names, back_weapon)
+            print(f"Would rebuild '{filename}' (changed: {', '.join(cache.stale_inputs(filename, signatures[output]))})")
+        return None
+    if not outputs:
+        print(f"All diagnostics for {'_'.join(skin_names)} are up to date.")
+        return None
+
     # At this point, we know all skin names are valid and have been provided.
     print("Processing selected parts:")
     print(f"  - Legs:  '{available_dirs[leg_skin_name]}'")
     print(f"  - Torso: '{available_dirs[torso_skin_name]}'")
     print(f"  - Head:  '{available_dirs[head_skin_name]}'")
     
-    sheet = Spritesheet(available_dirs[leg_skin_name], available_dirs[torso_skin_name],head_skin_name)
+    sheet = Spritesheet(available_dirs[leg_skin_name], available_dirs[torso_skin_name],head_skin_name, indexed=indexed, dedup=frame_index is not None, frame_index=frame_index)
 
-    # create unarmed walk and run animations for all directions
-    stacked_sprites = []
-    animations_to_generate = ['walk', 'run']
-    for animation in animations_to_generate:
+    for output in outputs:
+        filename = render_output(sheet, output, skin_names, bg_color, show_indices, back_weapon)
+        if cache is not None and filename is not None:
+            cache.record(filename, signatures[output])
+
+    if cache is not None:
+        cache.save()
+    return sheet
+
+# --- Generate weapon animations ---
+# For each leg stance (idle, crouch), generate shoot, rack, and reload animations.
+WEAPON_CONFIGS = {
+    'pistol': {
+        'animations': ['shoot', 'rack', 'reload'],
+        'index_func': get_pistol_indexes,
+    },
+    'smg': {
+        'animations': ['shoot', 'rack', 'reload'],
+        'index_func': get_smg_indexes,
+    },
+    'shotgun': {
+        'animations': ['shoot', 'rack', 'reload'],
+        'index_func': get_shotgun_indexes,
+    },
+    'rifle': {
+        'animations': ['shoot', 'rack', 'reload'],
+        'index_func': get_rifle_indexes,
+    },
+}
+LEG_STANCES = ['idle', 'crouch']
+
+def diagnostic_outputs():
+    """Lists every output sheet as a (torso_type, leg_stance) pair; the unarmed sheet has no stance."""
+    return [('unarmed', None)] + [(weapon, leg_stance) for weapon in WEAPON_CONFIGS for leg_stance in LEG_STANCES]
+
+def output_dependencies(output):
+    """Lists the Spritesheet attributes (input sheets and metadata) a diagnostic output is rendered from."""
+    torso_type, _ = output
+    torso_prefix = 'torso' if torso_type == 'unarmed' else torso_type
+    return ['leg_sprites', 'leg_metadata_list', 'head_sprites', f'{torso_prefix}_sprites', f'{torso_type}_metadata_list']
+
+def outputs_affected_by(attribute, back_weapon=None):
+    """
+    Maps a reloaded Spritesheet attribute (e.g. 'smg_metadata_list') to the diagnostic outputs that depend on it.
+    'back_weapon_sprite' affects every output that draws back_weapon.
+    """
+    if attribute == 'back_weapon_sprite':
+        return [output for output in diagnostic_outputs() if output_back_weapon(output, back_weapon)]
+    return [output for output in diagnostic_outputs() if attribute in output_dependencies(output)]
+
+def output_back_weapon(output, back_weapon):
+    """The weapon to draw on the back of an output's frames: none on the sheet that holds that weapon."""
+    return back_weapon if output[0] != back_weapon else None
+
+def diagnostic_filename(output, skin_names, back_weapon=None):
+    leg_skin_name, torso_skin_name, head_skin_name = skin_names
+    torso_type, leg_stance = output
+    suffix = f"_back_{back_weapon}" if output_back_weapon(output, back_weapon) else ""
+    if torso_type == 'unarmed':
+        return f"{leg_skin_name}_{torso_skin_name}_{head_skin_name}_unarmed_walk_run{suffix}.png"
+    return f"{leg_skin_name}_{torso_skin_name}_{head_skin_name}_{torso_type}_{leg_stance}_legs{suffix}.png"
+
+def output_signature(cache, input_paths, output, flags, back_weapon=None):
+    """
+    Signature for the build cache: the output's own sheets and XMLs, the index tables and renderer
+    code, and the flags plus the back weapon this output actually draws.
+    """
+    from spritesheet import weapon_back_sprite_path
+    paths = [input_paths[attribute] for attribute in output_dependencies(output)] + RENDERER_SOURCE_PATHS
+    output_weapon = output_back_weapon(output, back_weapon)
+    if output_weapon:
+        paths.append(weapon_back_sprite_path(output_weapon))
+    return cache.signature(paths, dict(flags, back_weapon=output_weapon))
+
+def output_frames(output):
+    """Lists every frame of a diagnostic output in grid order as (animation, direction, leg_index, torso_index, head_index)."""
+    torso_type, leg_stance = output
+    frames = []
+
+    if torso_type == 'unarmed':
+        # create unarmed walk and run animations for all directions
+        animations_to_generate = ['walk', 'run']
+        for animation in animations_to_generate:
+            for direction in Direction:
+                leg_indexes = get_leg_indexes(direction, animation)
+                torso_indexes = get_unarmed_indexes(direction, animation)
+                if not leg_indexes or not torso_indexes:
+                    continue
+                head_index = get_head_indexes(direction)[0]
+                for leg_index, torso_index in zip(leg_indexes, torso_indexes):
+                    frames.append((animation, direction, leg_index, torso_index, head_index))
+        return frames
+
+    config = WEAPON_CONFIGS[torso_type]
+    for animation in config['animations']:
         for direction in Direction:
-            leg_indexes = get_leg_indexes(direction, animation)
-            torso_indexes = get_unarmed_indexes(direction, animation)
+            leg_indexes = get_leg_indexes(direction, leg_stance)
+            torso_indexes = config['index_func'](direction, animation)
+
             if not leg_indexes or not torso_indexes:
                 continue
+            
             head_index = get_head_indexes(direction)[0]
-            for leg_index, torso_index in zip(leg_indexes, torso_indexes):
-                stacked_sprites.append(sheet.create_stacked_sprite(leg_index, torso_index, head_index, show_indices=show_indices))
+            leg_index = leg_indexes[0] # For static stances, use the single leg frame.
+            for torso_index in torso_indexes:
+                frames.append((animation, direction, leg_index, torso_index, head_index))
+    return frames
+
+def render_output(sheet, output, skin_names, bg_color, show_indices, back_weapon=None):
+    """Composites and writes a single diagnostic sheet. Returns the output filename, or None if nothing was drawn."""
+    torso_type, leg_stance = output
+    back_weapon = output_back_weapon(output, back_weapon)
+
+    stacked_sprites = []
+    current_group = None
+    for animation, direction, leg_index, torso_index, head_index in output_frames(output):
+        if torso_type != 'unarmed' and (animation, direction) != current_group:
+            current_group = (animation, direction)
+            print(f"Generating {torso_type} {animation} for {leg_stance} stance in direction {direction.name}\tindex: {leg_index}, torso: {torso_index}, head: {head_index}")
+        stacked_sprites.append(sheet.create_stacked_sprite(leg_index, torso_index, head_index, torso_type=torso_type, show_indices=show_indices, back_weapon=back_weapon))
     
+    if not stacked_sprites:
+        return None
+
     # 5. Write the stacked sprite to a PNG file.
-    output_filename = f"{leg_skin_name}_{torso_skin_name}_{head_skin_name}_unarmed_walk_run.png"
+    output_filename = diagnostic_filename(output, skin_names, back_weapon)
     write_stacked_sprites(stacked_sprites, output_filename, max_cols=MAX_SPRITE_COLUMNS, bg_color=bg_color)
     print(f"\nSuccessfully created composite sprite: '{output_filename}'")
+    return output_filename
 
-    # --- Generate weapon animations ---
-    # For each leg stance (idle, crouch), generate shoot, rack, and reload animations.
-    weapon_configs = {
-        'pistol': {
-            'animations': ['shoot', 'rack', 'reload'],
-            'index_func': get_pistol_indexes,
-        },
-        'smg': {
-            'animations': ['shoot', 'rack', 'reload'],
-            'index_func': get_smg_indexes,
-        },
-        'shotgun': {
-            'animations': ['shoot', 'rack', 'reload'],
-            'index_func': get_shotgun_indexes,
-        },
-        'rifle': {
-            'animations': ['shoot', 'rack', 'reload'],
-            'index_func': get_rifle_indexes,
-        },
-    }
-    leg_stances = ['idle', 'crouch']
-
-    for weapon, config in weapon_configs.items():
-        for leg_stance in leg_stances:
-            all_weapon_sprites = []
-            for animation in config['animations']:
-                for direction in Direction:
-                    leg_indexes = get_leg_indexes(direction, leg_stance)
-                    torso_indexes = config['index_func'](direction, animation)
-
-                    if not leg_indexes or not torso_indexes:
-                        continue
-                    
-                    head_index = get_head_indexes(direction)[0]
-                    leg_index = leg_indexes[0] # For static stances, use the single leg frame.
-                    print(f"Generating {weapon} {animation} for {leg_stance} stance in direction {direction.name}\tindex: {leg_index}, torso: {torso_indexes[0]}, head: {head_index}")
-                    for torso_index in torso_indexes:
-                        all_weapon_sprites.append(sheet.create_stacked_sprite(leg_index, torso_index, head_index, torso_type=weapon, show_indices=show_indices))
-            
-            if all_weapon_sprites:
-                output_filename = f"{leg_skin_name}_{torso_skin_name}_{head_skin_name}_{weapon}_{leg_stance}_legs.png"
-                write_stacked_sprites(all_weapon_sprites, output_filename, max_cols=MAX_SPRITE_COLUMNS, bg_color=bg_color)
-                print(f"\nSuccessfully created composite sprite: '{output_filename}'")
+def export_animations(available_dirs, leg_skin_name, torso_skin_name, head_skin_name, bg_color, fmt, indexed=False, frame_index=None):
+    """Writes animated previews for every weapon/animation/direction into '{legs}_{torso}_{head}_previews/'."""
+    from preview import export_previews
+    from spritesheet import Spritesheet
+    sheet = Spritesheet(available_dirs[leg_skin_name], available_dirs[torso_skin_name], head_skin_name, indexed=indexed, dedup=frame_index is not None, frame_index=frame_index)
+    output_dir = Path.cwd() / f"{leg_skin_name}_{torso_skin_name}_{head_skin_name}_previews"
+    background = None if bg_color == 'transparent' else BACKGROUND_COLORS[bg_color]
+    export_previews(sheet, output_dir, fmt, bg_color=background)
+
+def snapshot_mtimes(paths):
+    """Returns {path: mtime_ns} for the paths that currently exist."""
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return mtimes
+
+def watch_diagnostic(available_dirs, leg_skin_name, torso_skin_name, head_skin_name, bg_color, show_indices, indexed=False, frame_index=None, back_weapon=None, interval=WATCH_POLL_INTERVAL):
+    """
+    Renders every diagnostic sheet once, then polls the input files and re-renders only
+    the sheets that depend on whatever changed. The Spritesheet stays loaded between
+    passes, so each change only re-decodes the file that was edited.
+    """
+    import xml.etree.ElementTree as ET
+    from spritesheet import Spritesheet, weapon_back_sprite_path
+    skin_names = (leg_skin_name, torso_skin_name, head_skin_name)
+    sheet = Spritesheet(available_dirs[leg_skin_name], available_dirs[torso_skin_name], head_skin_name, indexed=indexed, dedup=frame_index is not None, frame_index=frame_index)
+
+    def render(outputs):
+        for output in outputs:
+            try:
+                render_output(sheet, output, skin_names, bg_color, show_indices, back_weapon)
+            except (AttributeError, IndexError) as e:
+                # A sheet that is missing or too short stays broken until its file changes; keep watching.
+                print(f"Error: Could not render {diagnostic_filename(output, skin_names, back_weapon)}: {e}")
+
+    render(diagnostic_outputs())
+    watched_paths = list(dict.fromkeys(sheet.input_paths.values()))
+    if back_weapon:
+        watched_paths.append(weapon_back_sprite_path(back_weapon))
+    mtimes = snapshot_mtimes(watched_paths)
+
+    print(f"\nWatching {len(watched_paths)} files for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot_mtimes(watched_paths)
+            changed = [path for path in watched_paths if current.get(path) != mtimes.get(path) and path in current]
+            mtimes = current
+            if not changed:
+                continue
+
+            start = time.perf_counter()
+            outputs = []
+            for path in changed:
+                print(f"Changed: '{path}'")
+                try:
+                    reloaded = sheet.reload(path)
+                except (IOError, ET.ParseError) as e:
+                    print(f"Error reloading '{path}': {e}")
+                    continue
+                for attribute in reloaded:
+                    outputs.extend(output for output in outputs_affected_by(attribute, back_weapon) if output not in outputs)
+
+            render(outputs)
+            print(f"Re-rendered {len(outputs)} sheet(s) in {time.perf_counter() - start:.2f}s.")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
 
 def write_stacked_sprites(stacked_sprites, output_filename, max_cols=10, bg_color='white'):
     """
@@ -162,19 +425,15 @@ def write_stacked_sprites(stacked_sprites, output_filename, max_cols=10, bg_colo
         max_cols (int): The maximum number of sprites per row.
         bg_color (str): The background color ('white', 'black', or 'transparent').
     """
+    from PIL import Image
+    from spritesheet import TRANSPARENT_INDEX, opaque_bbox, paste_opaque
     if not stacked_sprites:
         print("Warning: No sprites to write.")
         return
 
     num_sprites = len(stacked_sprites)
 
-    # Map color names to RGBA values
-    color_map = {
-        'white': (255, 255, 255, 255),
-        'black': (0, 0, 0, 255),
-        'transparent': (0, 0, 0, 0)
-    }
-    background_rgba = color_map.get(bg_color, (255, 255, 255, 255)) # Default to white
+    background_rgba = BACKGROUND_COLORS.get(bg_color, (255, 255, 255, 255)) # Default to white
 
     # Determine the cell size for the grid. Each cell will be large enough
     # to accommodate the largest sprite.
@@ -189,16 +448,37 @@ def write_stacked_sprites(stacked_sprites, output_filename, max_cols=10, bg_colo
     total_width = cols * cell_width
     total_height = int(rows * cell_height)
 
+    # Indexed sprites that share a palette are laid out in index space. The cells don't
+    # overlap and start out transparent, so each sprite is copied whole, and the sheet is
+    # saved as an indexed PNG: the background is just the color of TRANSPARENT_INDEX.
+    palette = stacked_sprites[0].palette.tobytes() if stacked_sprites[0].mode == "P" else None
+    if palette is not None and all(sprite.mode == "P" and sprite.palette.tobytes() == palette for sprite in stacked_sprites):
+        with profiling.stage('grid'):
+            indexed_grid = Image.new("P", (total_width, total_height), TRANSPARENT_INDEX)
+            for i, sprite in enumerate(stacked_sprites):
+                indexed_grid.paste(sprite, ((i % cols) * cell_width, (i // cols) * cell_height))
+            colors = bytearray(palette)
+            colors[TRANSPARENT_INDEX * 3:TRANSPARENT_INDEX * 3 + 3] = bytes(background_rgba[:3])
+            indexed_grid.putpalette(colors)
+            if background_rgba[3] == 0:
+                indexed_grid.info['transparency'] = TRANSPARENT_INDEX
+        with profiling.stage('encode'):
+            indexed_grid.save(output_filename)
+        return
+
     # Create a new image with the specified background color.
     final_spritesheet = Image.new("RGBA", (total_width, total_height), background_rgba)
 
-    # Paste each sprite into its calculated position in the grid.
-    for i, sprite in enumerate(stacked_sprites):
-        col = i % cols
-        row = i // cols
-        final_spritesheet.paste(sprite, (col * cell_width, row * cell_height), sprite)
+    # Paste each sprite into its calculated position in the grid. Only each sprite's opaque
+    # box is blended, and empty cells are left as background.
+    with profiling.stage('grid'):
+        for i, sprite in enumerate(stacked_sprites):
+            col = i % cols
+            row = i // cols
+            paste_opaque(final_spritesheet, sprite, (col * cell_width, row * cell_height), opaque_bbox(sprite))
 
-    final_spritesheet.save(output_filename)
+    with profiling.stage('encode'):
+        final_spritesheet.save(output_filename)
 
 if __name__ == '__main__':
     main()
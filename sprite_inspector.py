@@ -0,0 +1,127 @@
+import math
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from spritesheet import composite_cells, slice_atlas
+
+# Importable backend for 'sprite inspector.ipynb'. Sheets are held as (N, h, w, 4) arrays,
+# animation strips are composited with one array operation each, and a set of frames is
+# rendered as a single contact-sheet image, so showing 100 frames is one imshow call.
+
+# --- Configuration ---
+SHEET_FILES = {
+    'legs': ('Legs.png', (64, 64)),
+    'torso': ('Torso.png', (64, 64)),
+    'pistol': ('pistol.png', (64, 64)),
+    'smg': ('smg.png', (64, 64)),
+    'rifle': ('rifle.png', (64, 64)),
+    'shotgun': ('shotgun.png', (64, 64)),
+    'head': ('Head.png', (32, 32)),
+}
+
+# Where a 32x32 head lands on a 64x64 torso when no metadata is available.
+DEFAULT_HEAD_OFFSET = (16, -2)
+
+# Leg walk frames per direction (down, rightDown, right, rightUp, up).
+WALK_LEG_INDEXES = [[5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16], [17, 18, 19, 20], [21, 22, 23, 24]]
+
+
+def load_atlases(skin_dir, sheets=None):
+    """Loads the sheets of one skin directory as {name: (N, h, w, 4) array}, skipping missing files."""
+    skin_dir = Path(skin_dir)
+    atlases = {}
+    for name in sheets or SHEET_FILES:
+        filename, sprite_size = SHEET_FILES[name]
+        path = skin_dir / filename
+        if not path.is_file():
+            print(f"Warning: '{path}' not found; skipping '{name}'.")
+            continue
+        atlases[name] = slice_atlas(Image.open(path), sprite_size)
+    return atlases
+
+
+def as_frames(images):
+    """Normalizes an array, a PIL image, or a list of either (single cells or strips) into one (N, h, w, 4) array."""
+    if isinstance(images, np.ndarray):
+        return images[np.newaxis] if images.ndim == 3 else images
+    if isinstance(images, Image.Image):
+        return np.asarray(images.convert("RGBA"))[np.newaxis]
+
+    frames = [as_frames(image) for image in images]
+    if not frames:
+        return np.zeros((0, 1, 1, 4), dtype=np.uint8)
+    height = max(frame.shape[1] for frame in frames)
+    width = max(frame.shape[2] for frame in frames)
+    padded = [np.pad(frame, ((0, 0), (0, height - frame.shape[1]), (0, width - frame.shape[2]), (0, 0))) for frame in frames]
+    return np.concatenate(padded)
+
+
+def combine(bottom, top, offset=(0, 0)):
+    """Pastes `top` over `bottom`. Either side may be a single cell or a whole strip of frames."""
+    return composite_cells(bottom, top, offset)
+
+
+def paste_head(frames, heads, offset=DEFAULT_HEAD_OFFSET):
+    """Pastes head cells (one per frame, or one for the whole strip) over a strip of frames."""
+    return composite_cells(frames, heads, offset)
+
+
+def gunwalk(atlases, gun, gun_indexes=(0, 5, 10, 14, 18)):
+    """
+    Composites the walking legs under one gun frame per direction.
+    Returns five (4, h, w, 4) strips in direction order (down, rightDown, right, rightUp, up).
+    """
+    legs = atlases['legs']
+    gun_cells = atlases[gun]
+    return [combine(legs[leg_indexes], gun_cells[gun_index]) for leg_indexes, gun_index in zip(WALK_LEG_INDEXES, gun_indexes)]
+
+
+def contact_sheet(images, columns=10, bg_color=(255, 255, 255, 255), labels=True, first_label=0):
+    """
+    Lays frames out on a grid as one RGBA image, optionally labelling each cell with its index.
+    `labels` may also be a list of strings, one per frame.
+    """
+    frames = as_frames(images)
+    count, height, width = frames.shape[:3]
+    if count == 0:
+        return Image.new("RGBA", (1, 1), bg_color)
+
+    columns = min(columns, count)
+    rows = math.ceil(count / columns)
+    padded = np.zeros((rows * columns, height, width, 4), dtype=np.uint8)
+    padded[:count] = frames
+    grid = padded.reshape(rows, columns, height, width, 4).swapaxes(1, 2).reshape(rows * height, columns * width, 4)
+
+    sheet = Image.new("RGBA", (columns * width, rows * height), bg_color)
+    sheet.alpha_composite(Image.fromarray(grid))
+
+    if labels:
+        draw = ImageDraw.Draw(sheet)
+        font = ImageFont.load_default()
+        texts = labels if isinstance(labels, list) else [str(first_label + i) for i in range(count)]
+        for i, text in enumerate(texts[:count]):
+            draw.text(((i % columns) * width + 1, (i // columns) * height), text, fill=(0, 0, 0, 255), font=font)
+    return sheet
+
+
+def display_images(images, columns=10, max_images=100, scale=4, labels=True):
+    """Shows frames in a notebook as a single contact sheet, i.e. one imshow instead of one subplot per frame."""
+    import matplotlib.pyplot as plt
+
+    frames = as_frames(images)
+    if len(frames) == 0:
+        print("No images to display.")
+        return None
+
+    if len(frames) > max_images:
+        print(f"Showing {max_images} images of {len(frames)}:")
+        frames = frames[:max_images]
+
+    sheet = contact_sheet(frames, columns=columns, labels=labels)
+    fig = plt.figure(figsize=(sheet.width * scale / 100, sheet.height * scale / 100))
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.imshow(sheet, interpolation='nearest')
+    ax.axis('off')
+    return fig
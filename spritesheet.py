@@ -1,10 +1,44 @@
 from pathlib import Path
 import argparse
 import sys
-from dataclasses import dataclass, field
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple, dataclass, field
+import numpy as np
 from PIL import Image,  ImageDraw, ImageFont
 import xml.etree.ElementTree as ET
 
+import profiling
+from skin_catalog import BACK_WEAPONS, load_config
+
+_config = load_config()
+HEAD_SPRITESHEET_DIRECTORY = _config.head_spritesheet_directory
+WEAPON_SPRITE_DIRECTORY = _config.weapon_sprite_directory
+
+# Palette index reserved for fully transparent pixels in indexed sheets.
+TRANSPARENT_INDEX = 0
+
+# Palette index -> paste mask value, for opaque_mask. Built once rather than per paste.
+_OPAQUE_LUT = [0 if i == TRANSPARENT_INDEX else 255 for i in range(256)]
+
+# Every sheet a Spritesheet loads and the size of its cells.
+SHEET_SPRITE_SIZES = {
+    'leg_sprites': (64, 64),
+    'torso_sprites': (64, 64),
+    'head_sprites': (32, 32),
+    'pistol_sprites': (64, 64),
+    'smg_sprites': (64, 64),
+    'rifle_sprites': (64, 64),
+    'shotgun_sprites': (64, 64),
+}
+
+# Threads used to decode a Spritesheet's seven sheets and parse its six metadata files.
+LOAD_THREADS = 8
+
+# Rotated back-weapon sprites, keyed by (path, mtime_ns, angle). Shared by every Spritesheet,
+# since the weapon sprites don't depend on the skin.
+_rotated_weapons = {}
+
 
 @dataclass
 class Point:
@@ -74,50 +108,420 @@ def save_leg_metadata_at_path(path: Path, metadata_list: list[LegSpriteMetadata]
     tree.write(path, encoding='utf-8', xml_declaration=True)
 
 
+def load_leg_metadata_at_path(path: Path):
+    """Loads leg sprite metadata from an XML file and returns a list of LegSpriteMetadata objects."""
+    if not path.is_file():
+        raise FileNotFoundError(f"Metadata file not found at '{path}'")
+
+    tree = ET.parse(path)
+    root = tree.getroot()
+
+    metadata_list = []
+    for sprite_data_elem in root.findall('SpriteDataLegs'):
+        metadata = LegSpriteMetadata()
+        torsoOffset_elem = sprite_data_elem.find('torsoOffset')
+        if torsoOffset_elem is not None:
+            x_elem = torsoOffset_elem.find('x')
+            y_elem = torsoOffset_elem.find('y')
+            if x_elem is not None and y_elem is not None and x_elem.text is not None and y_elem.text is not None:
+                metadata.torso_offset = Point(x=int(x_elem.text), y=int(y_elem.text))
+
+        metadata_list.append(metadata)
+
+    return metadata_list
+
+def load_metadata_at_path(path: Path):
+    """Loads sprite metadata from an XML file and returns a list of SpriteMetadata objects."""
+    if not path.is_file():
+        raise FileNotFoundError(f"Metadata file not found at '{path}'")
+
+    tree = ET.parse(path)
+    root = tree.getroot()
+
+    metadata_list = []
+    for sprite_data_elem in root.findall('SpriteData'):
+        metadata = SpriteMetadata()
+        head_offset_elem = sprite_data_elem.find('headOffset')
+        if head_offset_elem is not None:
+            x_elem = head_offset_elem.find('x')
+            y_elem = head_offset_elem.find('y')
+            if x_elem is not None and y_elem is not None and x_elem.text is not None and y_elem.text is not None:
+                metadata.head_offset = Point(x=int(x_elem.text), y=int(y_elem.text))
+
+        head_sprite_elem = sprite_data_elem.find('headSprite')
+        if head_sprite_elem is not None and head_sprite_elem.text is not None:
+            metadata.head_sprite = int(head_sprite_elem.text)
+
+        override_head_direction_elem = sprite_data_elem.find('overrideHeadDirection')
+        if override_head_direction_elem is not None and override_head_direction_elem.text is not None:
+            metadata.override_head_direction = override_head_direction_elem.text.lower() == 'true'
+
+        head_in_front_elem = sprite_data_elem.find('headInFrontOfTorso')
+        if head_in_front_elem is not None and head_in_front_elem.text is not None:
+            metadata.head_in_front_of_torso = head_in_front_elem.text.lower() == 'true'
+
+        weapon_back_position_elem = sprite_data_elem.find('weaponBackPosition')
+        if weapon_back_position_elem is not None:
+            x_elem = weapon_back_position_elem.find('x')
+            y_elem = weapon_back_position_elem.find('y')
+            if x_elem is not None and y_elem is not None and x_elem.text is not None and y_elem.text is not None:
+                metadata.weapon_back_position = Point(x=int(x_elem.text), y=int(y_elem.text))
+
+        weapon_back_rotation_elem = sprite_data_elem.find('weaponBackRotation')
+        if weapon_back_rotation_elem is not None and weapon_back_rotation_elem.text is not None:
+            metadata.weapon_back_rotation = float(weapon_back_rotation_elem.text)
+
+        weapon_back_in_front_of_torso_elem = sprite_data_elem.find('weaponBackInFrontOfTorso')
+        if weapon_back_in_front_of_torso_elem is not None and weapon_back_in_front_of_torso_elem.text is not None:
+            metadata.weapon_back_in_front_of_torso = weapon_back_in_front_of_torso_elem.text.lower() == 'true'
+
+        weapon_visible_elem = sprite_data_elem.find('weaponVisible')
+        if weapon_visible_elem is not None and weapon_visible_elem.text is not None:
+            metadata.weapon_visible = weapon_visible_elem.text.lower() == 'true'
+
+        metadata_list.append(metadata)
+
+    return metadata_list
+
+
+class Palette:
+    """An RGB color table shared by indexed sprites. Index 0 is reserved for transparency."""
+
+    def __init__(self):
+        self.colors = [(0, 0, 0)]
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __contains__(self, rgb):
+        return rgb in self._indexes
+
+    def index(self, rgb):
+        """Returns the palette index for an (r, g, b) color, adding it if needed."""
+        index = self._indexes.get(rgb)
+        if index is None:
+            if len(self.colors) >= 256:
+                raise ValueError("Palette is full (256 colors).")
+            index = len(self.colors)
+            self.colors.append(rgb)
+            self._indexes[rgb] = index
+        return index
+
+    def flat(self):
+        """Returns the palette as a flat [r, g, b, r, g, b, ...] list for Image.putpalette."""
+        return [channel for color in self.colors for channel in color]
+
+
+def index_image(image, palette: Palette):
+    """
+    Converts an image into a palette-indexed ('P') image whose indexes refer to `palette`.
+
+    Fully transparent pixels map to TRANSPARENT_INDEX, so the alpha mask is implied by
+    the index data. Returns None if the image cannot be represented that way, either
+    because it has partially transparent pixels or because its colors would overflow
+    the 256-entry palette; callers should fall back to RGBA in that case.
+    """
+    if image.mode == "P" and image.palette is not None and image.palette.mode == "RGB":
+        return remap_indexed_image(image, palette)
+
+    pixels = np.asarray(image.convert("RGBA"))
+    alpha = pixels[..., 3]
+    if np.any((alpha != 0) & (alpha != 255)):
+        return None
+
+    opaque = alpha == 255
+    keys = (pixels[..., 0].astype(np.uint32) << 16) | (pixels[..., 1].astype(np.uint32) << 8) | pixels[..., 2]
+    unique_keys, inverse = np.unique(keys[opaque], return_inverse=True)
+    colors = [((key >> 16) & 0xFF, (key >> 8) & 0xFF, key & 0xFF) for key in unique_keys.tolist()]
+
+    new_colors = sum(1 for color in colors if color not in palette)
+    if len(palette) + new_colors > 256:
+        return None
+
+    lut = np.array([palette.index(color) for color in colors], dtype=np.uint8)
+    indices = np.full(alpha.shape, TRANSPARENT_INDEX, dtype=np.uint8)
+    indices[opaque] = lut[inverse]
+
+    indexed = Image.frombytes("P", image.size, indices.tobytes())
+    indexed.putpalette(palette.flat())
+    indexed.info['transparency'] = TRANSPARENT_INDEX
+    return indexed
+
+
+def remap_indexed_image(image, palette: Palette):
+    """
+    index_image for a paletted ('P') source: its indexes are remapped to `palette` through a
+    256-entry table, so the sheet never has to be expanded to RGBA. Transparency comes from
+    the source's tRNS entries. Returns None under the same conditions as index_image.
+    """
+    indices = np.asarray(image)
+    used = np.flatnonzero(np.bincount(indices.ravel(), minlength=256)).tolist()
+    colors = image.getpalette() or []
+    colors += [0] * (768 - len(colors))
+    alpha = [255] * 256
+    transparency = image.info.get('transparency')
+    if isinstance(transparency, int):
+        alpha[transparency] = 0
+    elif isinstance(transparency, bytes):
+        alpha[:len(transparency)] = transparency
+    if any(alpha[i] not in (0, 255) for i in used):
+        return None
+
+    opaque_colors = {i: tuple(colors[i * 3:i * 3 + 3]) for i in used if alpha[i] == 255}
+    if len(palette) + len({color for color in opaque_colors.values() if color not in palette}) > 256:
+        return None
+    lut = np.full(256, TRANSPARENT_INDEX, dtype=np.uint8)
+    for i, color in opaque_colors.items():
+        lut[i] = palette.index(color)
+
+    indexed = Image.frombytes("P", image.size, lut[indices].tobytes())
+    indexed.putpalette(palette.flat())
+    indexed.info['transparency'] = TRANSPARENT_INDEX
+    return indexed
+
+
+def opaque_mask(sprite):
+    """Returns a paste mask for a sprite: a 1-bit mask for indexed sprites, the sprite itself otherwise."""
+    if sprite.mode == "P":
+        return sprite.point(_OPAQUE_LUT, "1")
+    return sprite
+
+
+def opaque_bbox(sprite):
+    """Returns the (left, upper, right, lower) box of a sprite's visible pixels, or None if it has none."""
+    if sprite.mode == "P":
+        return sprite.getbbox()  # TRANSPARENT_INDEX is 0, so nonzero means visible
+    if sprite.mode == "RGBA":
+        return sprite.getchannel("A").getbbox()
+    return (0, 0) + sprite.size
+
+
+def cell_bounds(opaque, sprite_size=(64, 64)):
+    """
+    Tight opaque boxes for every cell of a sheet at once, in slice_atlas order. `opaque` is the
+    sheet's (H, W) boolean visibility mask. Returns a list of (left, upper, right, lower)
+    tuples, None for empty cells.
+    """
+    sprite_w, sprite_h = sprite_size
+    rows = -(-opaque.shape[0] // sprite_h)
+    cols = -(-opaque.shape[1] // sprite_w)
+    opaque = np.pad(opaque, ((0, rows * sprite_h - opaque.shape[0]), (0, cols * sprite_w - opaque.shape[1])))
+    cells = opaque.reshape(rows, sprite_h, cols, sprite_w)
+    row_any = cells.any(axis=3).transpose(0, 2, 1).reshape(rows * cols, sprite_h)
+    col_any = cells.any(axis=1).reshape(rows * cols, sprite_w)
+    top, bottom = row_any.argmax(axis=1), sprite_h - row_any[:, ::-1].argmax(axis=1)
+    left, right = col_any.argmax(axis=1), sprite_w - col_any[:, ::-1].argmax(axis=1)
+    empty = ~row_any.any(axis=1)
+    return [None if e else (l, t, r, b) for e, l, t, r, b in zip(empty.tolist(), left.tolist(), top.tolist(), right.tolist(), bottom.tolist())]
+
+
+def opaque_layer(sprite, bbox):
+    """
+    Prepares a sprite for pasting: (sprite cropped to `bbox`, its paste mask, bbox), or None
+    for a fully transparent sprite (bbox None). Keep the result to paste the same sprite
+    repeatedly without cropping it and rebuilding its indexed mask each time.
+    """
+    if bbox is None:
+        return None
+    if bbox != (0, 0) + sprite.size:
+        sprite = sprite.crop(bbox)
+    return sprite, opaque_mask(sprite), bbox
+
+
+def paste_layer(canvas, layer, offset):
+    """Pastes an opaque_layer with the sprite's top-left at `offset`, respecting transparency. None is skipped."""
+    if layer is not None:
+        sprite, mask, bbox = layer
+        canvas.paste(sprite, (offset[0] + bbox[0], offset[1] + bbox[1]), mask)
+
+
+def paste_opaque(canvas, sprite, offset, bbox):
+    """
+    Pastes only the `bbox` region of a sprite (its opaque_bbox, or a precomputed cell bound),
+    respecting transparency. Fully transparent sprites (bbox None) are skipped.
+    """
+    paste_layer(canvas, opaque_layer(sprite, bbox), offset)
+
+
+def slice_atlas(image, sprite_size=(64, 64)):
+    """
+    Slices a sheet into an (N, h, w, 4) uint8 array of RGBA cells in row-major order,
+    the same order load_spritesheet_at_path uses, with one reshape instead of N crops.
+    Partial cells at the right and bottom edges are padded with transparency.
+    """
+    pixels = np.asarray(image.convert("RGBA"))
+    sprite_w, sprite_h = sprite_size
+    rows = -(-pixels.shape[0] // sprite_h)
+    cols = -(-pixels.shape[1] // sprite_w)
+    pad_h = rows * sprite_h - pixels.shape[0]
+    pad_w = cols * sprite_w - pixels.shape[1]
+    if pad_h or pad_w:
+        pixels = np.pad(pixels, ((0, pad_h), (0, pad_w), (0, 0)))
+    return pixels.reshape(rows, sprite_h, cols, sprite_w, 4).swapaxes(1, 2).reshape(rows * cols, sprite_h, sprite_w, 4)
+
+
+def unslice_atlas(cells, columns, size=None):
+    """
+    The inverse of slice_atlas: lays (N, h, w, 4) cells out row-major on a grid `columns` wide
+    and returns an RGBA image, cropped to `size` (width, height) when given.
+    """
+    count, sprite_h, sprite_w = cells.shape[:3]
+    rows = -(-count // columns)
+    grid = np.zeros((rows * columns, sprite_h, sprite_w, 4), dtype=np.uint8)
+    grid[:count] = cells
+    grid = grid.reshape(rows, columns, sprite_h, sprite_w, 4).swapaxes(1, 2).reshape(rows * sprite_h, columns * sprite_w, 4)
+    if size is not None:
+        grid = grid[:size[1], :size[0]]
+    return Image.fromarray(np.ascontiguousarray(grid), "RGBA")
+
+
+def composite_cells(base, layer, offset=(0, 0)):
+    """
+    Alpha-blends `layer` over `base` at a pixel offset, the way Image.paste(layer, offset, layer)
+    does, but for whole animation strips at once. `base` is (..., h, w, 4) and `layer` is
+    (..., lh, lw, 4); leading frame axes broadcast, so one layer cell can be pasted over a
+    whole strip. Parts of the layer that fall outside the base are clipped. Returns a new array.
+    """
+    base = np.asarray(base)
+    layer = np.asarray(layer)
+    out = np.array(np.broadcast_to(base, np.broadcast_shapes(base.shape[:-3], layer.shape[:-3]) + base.shape[-3:]))
+
+    x, y = offset
+    height, width = base.shape[-3:-1]
+    layer_h, layer_w = layer.shape[-3:-1]
+    top, left = max(y, 0), max(x, 0)
+    bottom, right = min(y + layer_h, height), min(x + layer_w, width)
+    if top >= bottom or left >= right:
+        return out
+
+    src = layer[..., top - y:bottom - y, left - x:right - x, :].astype(np.uint16)
+    dst = out[..., top:bottom, left:right, :].astype(np.uint16)
+    mask = src[..., 3:4]
+    out[..., top:bottom, left:right, :] = (dst * (255 - mask) + src * mask + 127) // 255
+    return out
+
+
+def cell_digest(sprite):
+    """
+    Content hash of one cell. Fully transparent pixels hash the same whatever their stored
+    RGB, so cells that look identical are treated as identical.
+    """
+    if sprite.mode == "P":
+        data = sprite.tobytes()
+    else:
+        pixels = np.array(sprite.convert("RGBA") if sprite.mode != "RGBA" else sprite)
+        pixels[pixels[..., 3] == 0] = 0
+        data = pixels.tobytes()
+    return hashlib.blake2b(data, digest_size=16, person=b'%dx%d' % sprite.size).hexdigest()
+
+
+def weapon_back_sprite_path(weapon):
+    return Path(WEAPON_SPRITE_DIRECTORY) / f'{weapon}.png'
+
+
+def rotated_weapon_sprite(weapon, angle):
+    """
+    Returns a weapon sprite rotated counterclockwise by `angle` degrees (Unity's z rotation),
+    expanded to fit and without resampling blur. Each (weapon, angle) is rotated only once.
+    """
+    path = weapon_back_sprite_path(weapon)
+    key = (str(path), path.stat().st_mtime_ns, round(angle % 360, 3))
+    sprite = _rotated_weapons.get(key)
+    if sprite is None:
+        with profiling.stage('rotate'):
+            sprite = Image.open(path).convert("RGBA")
+            if key[2]:
+                sprite = sprite.rotate(angle, resample=Image.NEAREST, expand=True, fillcolor=(0, 0, 0, 0))
+        _rotated_weapons[key] = sprite
+        profiling.count('weapon rotations')
+    return sprite
+
+
+def spritesheet_input_paths(leg_skin_path, torso_skin_path, head_skin_name):
+    """Returns {Spritesheet attribute: source file} for every sheet and metadata file a Spritesheet loads."""
+    return {
+        'leg_sprites': leg_skin_path / 'Legs.png',
+        'torso_sprites': torso_skin_path / 'Torso.png',
+        'head_sprites': Path(HEAD_SPRITESHEET_DIRECTORY) / f'{head_skin_name}.png',
+        'pistol_sprites': torso_skin_path / 'pistol.png',
+        'smg_sprites': torso_skin_path / 'smg.png',
+        'rifle_sprites': torso_skin_path / 'rifle.png',
+        'shotgun_sprites': torso_skin_path / 'shotgun.png',
+        'leg_metadata_list': leg_skin_path / 'LegSpriteData.xml',
+        'unarmed_metadata_list': torso_skin_path / 'TorsoSpriteData.xml',
+        'pistol_metadata_list': torso_skin_path / 'pistolSpriteData.xml',
+        'smg_metadata_list': torso_skin_path / 'smgSpriteData.xml',
+        'rifle_metadata_list': torso_skin_path / 'rifleSpriteData.xml',
+        'shotgun_metadata_list': torso_skin_path / 'shotgunSpriteData.xml',
+    }
+
+
 class Spritesheet:
-    def __init__(self, leg_skin_path, torso_skin_path, head_skin_name):
-        
-        HEAD_SPRITESHEET_DIRECTORY = '/Users/rfoltz/dev/game-dev/wetworks/Assets/Resources/sprites/spritesheets/head'
+    def __init__(self, leg_skin_path, torso_skin_path, head_skin_name, indexed=False, dedup=False, frame_index=None):
         
         # 1. Construct the full paths to the required spritesheet files.
-        leg_sheet_path = leg_skin_path / 'Legs.png'
-        torso_sheet_path = torso_skin_path / 'Torso.png'
-        pistol_sheet_path = torso_skin_path / 'pistol.png'
-        smg_sheet_path = torso_skin_path / 'smg.png'
-        rifle_sheet_path = torso_skin_path / 'rifle.png'
-        shotgun_sheet_path = torso_skin_path / 'shotgun.png'
-        head_sheet_path = Path(HEAD_SPRITESHEET_DIRECTORY) / f'{head_skin_name}.png'
-
-        leg_metadata_path = leg_skin_path / 'LegSpriteData.xml'
-        unarmed_metadata_path = torso_skin_path / 'TorsoSpriteData.xml'
-        pistol_metadata_path = torso_skin_path / 'pistolSpriteData.xml'
-        smg_metadata_path = torso_skin_path / 'smgSpriteData.xml'
-        rifle_metadata_path = torso_skin_path / 'rifleSpriteData.xml'
-        shotgun_metadata_path = torso_skin_path / 'shotgunSpriteData.xml'
+        # The paths are remembered per attribute so single files can be reloaded later.
+        self.input_paths = spritesheet_input_paths(leg_skin_path, torso_skin_path, head_skin_name)
+        leg_sheet_path = self.input_paths['leg_sprites']
+        torso_sheet_path = self.input_paths['torso_sprites']
+        head_sheet_path = self.input_paths['head_sprites']
+
+        leg_metadata_path = self.input_paths['leg_metadata_list']
+        unarmed_metadata_path = self.input_paths['unarmed_metadata_list']
+        pistol_metadata_path = self.input_paths['pistol_metadata_list']
+        smg_metadata_path = self.input_paths['smg_metadata_list']
+        rifle_metadata_path = self.input_paths['rifle_metadata_list']
+        shotgun_metadata_path = self.input_paths['shotgun_metadata_list']
         
+        # When indexed, every sheet shares one palette so composites can be built in index space.
+        self.indexed = indexed
+        self.palette = Palette()
+
+        # When dedup is on, every loaded cell is content-hashed and composites are memoized
+        # by the hashes of their layers, so pixel-identical frames are only composited once.
+        # With a frame_index.FrameIndex, the digests come from the index instead of being hashed here.
+        self.dedup = dedup
+        self.frame_index = frame_index
+        self.cell_digests = {}  # sheet path -> [digest per cell]
+
+        # Every loaded cell's tight opaque box (None if empty), so compositing only blends
+        # the part of each layer that can change the result.
+        self.opaque_bounds = {}  # sheet path -> [opaque bbox or None per cell]
+        self._composites = {}
+        self._cell_layers = {}    # (attribute, cell index) -> opaque_layer, prepared on the cell's first paste
+        self._weapon_layers = {}  # (weapon, angle) -> (rotated sprite, opaque_layer), indexed against self.palette when possible
+        self._canvases = {}       # (size, palette length) -> blank indexed canvas with the palette attached
+
         print("Processing selected parts:")
         print(f"  - Legs:  '{leg_sheet_path}'")
         print(f"  - Torso: '{torso_sheet_path}'")
         print(f"  - Head:  '{head_sheet_path}'")
 
+        # 2. Decode the spritesheets and parse the metadata concurrently. PNG decoding and zlib
+        # release the GIL, so the files load in parallel; every file reports its own error.
+        with ThreadPoolExecutor(max_workers=LOAD_THREADS) as pool:
+            decoded = {attribute: pool.submit(self.decode_spritesheet_at_path, self.input_paths[attribute]) for attribute in SHEET_SPRITE_SIZES}
+            metadata = {
+                'leg_metadata_list': pool.submit(self.load_leg_metadata_at_path, leg_metadata_path),
+                'unarmed_metadata_list': pool.submit(self.load_metadata_at_path, unarmed_metadata_path),
+                'pistol_metadata_list': pool.submit(self.load_metadata_at_path, pistol_metadata_path),
+                'smg_metadata_list': pool.submit(self.load_metadata_at_path, smg_metadata_path),
+                'rifle_metadata_list': pool.submit(self.load_metadata_at_path, rifle_metadata_path),
+                'shotgun_metadata_list': pool.submit(self.load_metadata_at_path, shotgun_metadata_path),
+            }
+
+            # 2.5 Slice the sheets into sprites in a fixed order, so an indexed palette
+            # is filled the same way on every run, then collect the torso sprite metadata.
+            for attribute, sprite_size in SHEET_SPRITE_SIZES.items():
+                self.load_attribute(attribute, lambda: self.load_spritesheet_at_path(self.input_paths[attribute], sprite_size, decoded[attribute].result()))
+            for attribute, future in metadata.items():
+                self.load_attribute(attribute, future.result)
+
+    def load_attribute(self, attribute, load):
+        """Sets one loaded input, reporting a missing or unreadable file without aborting the rest."""
         try:
-            # 2. Load the spritesheets and slice them into sprites.
-            self.leg_sprites = self.load_spritesheet_at_path(leg_sheet_path)
-            self.torso_sprites = self.load_spritesheet_at_path(torso_sheet_path)
-            self.head_sprites = self.load_spritesheet_at_path(head_sheet_path, sprite_size=(32, 32))
-            self.pistol_sprites = self.load_spritesheet_at_path(pistol_sheet_path)
-            self.smg_sprites = self.load_spritesheet_at_path(smg_sheet_path)
-            self.rifle_sprites = self.load_spritesheet_at_path(rifle_sheet_path)
-            self.shotgun_sprites = self.load_spritesheet_at_path(shotgun_sheet_path)
-
-            # 2.5 load the torso sprite metadata
-            self.leg_metadata_list = self.load_leg_metadata_at_path(leg_metadata_path)
-            self.unarmed_metadata_list = self.load_metadata_at_path(unarmed_metadata_path)
-            self.pistol_metadata_list = self.load_metadata_at_path(pistol_metadata_path)
-            self.smg_metadata_list = self.load_metadata_at_path(smg_metadata_path)
-            self.rifle_metadata_list = self.load_metadata_at_path(rifle_metadata_path)
-            self.shotgun_metadata_list = self.load_metadata_at_path(shotgun_metadata_path)
-
+            setattr(self, attribute, load())
         except FileNotFoundError as e:
             print(f"Error: A required file was not found.\n{e}")
             # sys.exit(1)
@@ -125,107 +529,143 @@ class Spritesheet:
             print(f"Error processing file: {e}")
             # sys.exit(1)
 
-    def load_spritesheet_at_path(self, path, sprite_size=(64, 64)):
-        """Loads a spritesheet from a path and slices it into sprites of a given size."""
+    def reload(self, path):
+        """
+        Reloads a single changed input file in place, leaving every other sheet warm.
+        Returns the names of the reloaded attributes (empty if the path is not an input).
+        A changed back-weapon sprite drops that weapon's cached layers and is reported
+        as 'back_weapon_sprite'.
+        """
+        path = Path(path)
+        reloaded = []
+        for attribute, input_path in self.input_paths.items():
+            if input_path != path:
+                continue
+            if attribute == 'leg_metadata_list':
+                value = self.load_leg_metadata_at_path(path)
+            elif attribute.endswith('_metadata_list'):
+                value = self.load_metadata_at_path(path)
+            else:
+                value = self.load_spritesheet_at_path(path, SHEET_SPRITE_SIZES[attribute])
+            setattr(self, attribute, value)
+            reloaded.append(attribute)
+        # rotated_weapon_sprite re-reads an edited weapon by mtime; only this sheet's layers go stale.
+        stale_weapons = [key for key in self._weapon_layers if weapon_back_sprite_path(key[0]) == path]
+        for key in stale_weapons:
+            del self._weapon_layers[key]
+        if stale_weapons:
+            reloaded.append('back_weapon_sprite')
+        if reloaded:
+            self._composites.clear()
+            self._cell_layers.clear()
+        return reloaded
+
+    def decode_spritesheet_at_path(self, path):
+        """
+        Reads and fully decodes a spritesheet, converted to RGBA unless it is about to be indexed.
+        Touches no shared state, so several sheets can be decoded on different threads.
+        """
         if not path.is_file():
             raise FileNotFoundError(f"Spritesheet not found at '{path}'")
 
         try:
-            img = Image.open(path).convert("RGBA")
+            with profiling.stage('decode'):
+                img = Image.open(path)
+                img.load()
+                return img if self.indexed else img.convert("RGBA")
         except Exception as e:
             raise IOError(f"Failed to load or process image at '{path}': {e}")
 
+    def load_spritesheet_at_path(self, path, sprite_size=(64, 64), decoded=None):
+        """
+        Loads a spritesheet from a path and slices it into sprites of a given size.
+        `decoded` is the sheet as already returned by decode_spritesheet_at_path, if any.
+        """
+        img = decoded if decoded is not None else self.decode_spritesheet_at_path(path)
+        if self.indexed:
+            with profiling.stage('index'):
+                indexed_img = index_image(img, self.palette)
+            if indexed_img is None:
+                print(f"Warning: '{path}' has partial transparency or too many colors to index; loading as RGBA.")
+            img = indexed_img if indexed_img is not None else img.convert("RGBA")
+
         sprite_w, sprite_h = sprite_size
         width, height = img.size
         if width % sprite_w != 0 or height % sprite_h != 0:
             print(f"Warning: Image dimensions ({width}x{height}) at '{path}' are not a multiple of {sprite_w}x{sprite_h}.")
 
         sprites = []
-        for y in range(0, height, sprite_h):
-            for x in range(0, width, sprite_w):
-                # Define the box for cropping: (left, upper, right, lower)
-                box = (x, y, x + sprite_w, y + sprite_h)
-                sprite = img.crop(box)
-                sprites.append(sprite)
+        with profiling.stage('slice'):
+            for y in range(0, height, sprite_h):
+                for x in range(0, width, sprite_w):
+                    # Define the box for cropping: (left, upper, right, lower)
+                    box = (x, y, x + sprite_w, y + sprite_h)
+                    sprite = img.crop(box)
+                    sprites.append(sprite)
+        profiling.count('sprites sliced', len(sprites))
+        with profiling.stage('bounds'):
+            pixels = np.asarray(img)
+            opaque = pixels != TRANSPARENT_INDEX if img.mode == "P" else pixels[..., 3] > 0
+            self.opaque_bounds[path] = cell_bounds(opaque, sprite_size)
+        if self.dedup and self.frame_index is not None:
+            self.cell_digests[path] = self.frame_index.cell_digests(path, sprite_size)
+        elif self.dedup:
+            self.cell_digests[path] = [cell_digest(sprite) for sprite in sprites]
         
         return sprites
 
+    @profiling.timed('xml')
     def load_leg_metadata_at_path(self, path):
-        """Loads sprite metadata from an XML file and returns a list of SpriteMetadata objects."""
-        if not path.is_file():
-            raise FileNotFoundError(f"Metadata file not found at '{path}'")
-
-        tree = ET.parse(path)
-        root = tree.getroot()
-
-        metadata_list = []
-        for sprite_data_elem in root.findall('SpriteDataLegs'):
-            metadata = LegSpriteMetadata()
-            torsoOffset_elem = sprite_data_elem.find('torsoOffset')
-            if torsoOffset_elem is not None:
-                x_elem = torsoOffset_elem.find('x')
-                y_elem = torsoOffset_elem.find('y')
-                if x_elem is not None and y_elem is not None and x_elem.text is not None and y_elem.text is not None:
-                    metadata.torso_offset = Point(x=int(x_elem.text), y=int(y_elem.text))
-
-            metadata_list.append(metadata)
-        
-        return metadata_list
+        return load_leg_metadata_at_path(path)
 
+    @profiling.timed('xml')
     def load_metadata_at_path(self, path):
-        """Loads sprite metadata from an XML file and returns a list of SpriteMetadata objects."""
-        if not path.is_file():
-            raise FileNotFoundError(f"Metadata file not found at '{path}'")
-
-        tree = ET.parse(path)
-        root = tree.getroot()
-
-        metadata_list = []
-        for sprite_data_elem in root.findall('SpriteData'):
-            metadata = SpriteMetadata()
-            head_offset_elem = sprite_data_elem.find('headOffset')
-            if head_offset_elem is not None:
-                x_elem = head_offset_elem.find('x')
-                y_elem = head_offset_elem.find('y')
-                if x_elem is not None and y_elem is not None and x_elem.text is not None and y_elem.text is not None:
-                    metadata.head_offset = Point(x=int(x_elem.text), y=int(y_elem.text))
-            
-            head_sprite_elem = sprite_data_elem.find('headSprite')
-            if head_sprite_elem is not None and head_sprite_elem.text is not None:
-                metadata.head_sprite = int(head_sprite_elem.text)
-
-            override_head_direction_elem = sprite_data_elem.find('overrideHeadDirection')
-            if override_head_direction_elem is not None and override_head_direction_elem.text is not None:
-                metadata.override_head_direction = override_head_direction_elem.text.lower() == 'true'
-
-            head_in_front_elem = sprite_data_elem.find('headInFrontOfTorso')
-            if head_in_front_elem is not None and head_in_front_elem.text is not None:
-                metadata.head_in_front_of_torso = head_in_front_elem.text.lower() == 'true'
-
-            weapon_back_position_elem = sprite_data_elem.find('weaponBackPosition')
-            if weapon_back_position_elem is not None:
-                x_elem = weapon_back_position_elem.find('x')
-                y_elem = weapon_back_position_elem.find('y')
-                if x_elem is not None and y_elem is not None and x_elem.text is not None and y_elem.text is not None:
-                    metadata.weapon_back_position = Point(x=int(x_elem.text), y=int(y_elem.text))
-            
-            weapon_back_rotation_elem = sprite_data_elem.find('weaponBackRotation')
-            if weapon_back_rotation_elem is not None and weapon_back_rotation_elem.text is not None:
-                metadata.weapon_back_rotation = float(weapon_back_rotation_elem.text)
-
-            weapon_back_in_front_of_torso_elem = sprite_data_elem.find('weaponBackInFrontOfTorso')
-            if weapon_back_in_front_of_torso_elem is not None and weapon_back_in_front_of_torso_elem.text is not None:
-                metadata.weapon_back_in_front_of_torso = weapon_back_in_front_of_torso_elem.text.lower() == 'true'
-
-            weapon_visible_elem = sprite_data_elem.find('weaponVisible')
-            if weapon_visible_elem is not None and weapon_visible_elem.text is not None:
-                metadata.weapon_visible = weapon_visible_elem.text.lower() == 'true'
-
-            metadata_list.append(metadata)
-        
-        return metadata_list
-    
-    def create_stacked_sprite(self, leg_index, torso_index, head_index, torso_type='unarmed', show_indices=False):
+        return load_metadata_at_path(path)
+
+    def back_weapon_layer(self, weapon, angle):
+        """
+        Returns (rotated back-weapon sprite, its opaque_layer) for this sheet, the sprite indexed
+        against the sheet's palette when the sheet is indexed.
+        """
+        key = (weapon, angle)
+        layer = self._weapon_layers.get(key)
+        if layer is None:
+            sprite = rotated_weapon_sprite(weapon, angle)
+            if self.indexed:
+                sprite = index_image(sprite, self.palette) or sprite
+            layer = self._weapon_layers[key] = (sprite, opaque_layer(sprite, opaque_bbox(sprite)))
+        return layer
+
+    def cell_layer(self, attribute, index, sprite):
+        """The opaque_layer of a loaded cell, prepared on its first paste and reused after that."""
+        key = (attribute, index)
+        if key not in self._cell_layers:
+            self._cell_layers[key] = opaque_layer(sprite, self.cell_bbox(attribute, index, sprite))
+        return self._cell_layers[key]
+
+    def cell_bbox(self, attribute, index, sprite):
+        """The opaque box precomputed for a loaded cell; computed on the spot for sprites not loaded from a sheet."""
+        bounds = self.opaque_bounds.get(self.input_paths.get(attribute))
+        return bounds[index] if bounds is not None and index < len(bounds) else opaque_bbox(sprite)
+
+    def composite_key(self, leg_index, torso_index, head_index, torso_type='unarmed', show_indices=False, back_weapon=None):
+        """
+        The dedup key of a composite: its layers' cell digests plus the metadata and options that
+        place them. Frames with equal keys are pixel-identical. Requires dedup.
+        """
+        torso_attribute = 'torso_sprites' if torso_type == 'unarmed' else f'{torso_type}_sprites'
+        torso_metadata = self.unarmed_metadata_list if torso_type == 'unarmed' else getattr(self, f'{torso_type}_metadata_list')
+        return (
+            self.cell_digests[self.input_paths['leg_sprites']][leg_index],
+            self.cell_digests[self.input_paths[torso_attribute]][torso_index],
+            self.cell_digests[self.input_paths['head_sprites']][head_index],
+            astuple(torso_metadata[torso_index]),
+            astuple(self.leg_metadata_list[leg_index]),
+            (leg_index, torso_index, head_index) if show_indices else None,
+            back_weapon,
+        )
+
+    def create_stacked_sprite(self, leg_index, torso_index, head_index, torso_type='unarmed', show_indices=False, back_weapon=None):
         torso_sprites = self.torso_sprites
         torso_metadata = self.unarmed_metadata_list
 
@@ -250,13 +690,42 @@ class Spritesheet:
         torso_data = torso_metadata[torso_index]
         head_sprite = self.head_sprites[head_index]
         leg_metadata = self.leg_metadata_list[leg_index]
+
+        torso_attribute = 'torso_sprites' if torso_type == 'unarmed' else f'{torso_type}_sprites'
+        if self.dedup:
+            key = self.composite_key(leg_index, torso_index, head_index, torso_type, show_indices, back_weapon)
+            stacked_sprite = self._composites.get(key)
+            if stacked_sprite is not None:
+                profiling.count('composites reused')
+                return stacked_sprite
+
+        back_weapon_sprite = weapon_layer = None
+        if back_weapon is not None and torso_data.weapon_visible:
+            back_weapon_sprite, weapon_layer = self.back_weapon_layer(back_weapon, torso_data.weapon_back_rotation)
+
+        layers = (
+            self.cell_layer('leg_sprites', leg_index, leg_sprite),
+            self.cell_layer(torso_attribute, torso_index, torso_sprite),
+            self.cell_layer('head_sprites', head_index, head_sprite),
+            weapon_layer,
+        )
+
         # 4. Stack the sprites to create a single 64x64 sprite.
-        stacked_sprite = self.add_sprites(leg_sprite, torso_sprite, head_sprite, torso_data, leg_metadata, leg_index, torso_index, head_index, show_indices)
-        
+        stacked_sprite = self.add_sprites(leg_sprite, torso_sprite, head_sprite, torso_data, leg_metadata, leg_index, torso_index, head_index, show_indices, back_weapon_sprite, layers)
+
+        if self.dedup:
+            self._composites[key] = stacked_sprite
         return stacked_sprite
     
-    def add_sprites(self, leg_sprite, torso_sprite, head_sprite, torso_metadata: SpriteMetadata, leg_metadata: LegSpriteMetadata, leg_index, torso_index, head_index, show_indices=False):
-        """Overlays three sprites, respecting transparency, to create a single composite sprite with dynamic dimensions."""
+    @profiling.timed('composite')
+    def add_sprites(self, leg_sprite, torso_sprite, head_sprite, torso_metadata: SpriteMetadata, leg_metadata: LegSpriteMetadata, leg_index, torso_index, head_index, show_indices=False, back_weapon_sprite=None, layers=None):
+        """
+        Overlays three sprites, respecting transparency, to create a single composite sprite with dynamic dimensions.
+        An already-rotated back_weapon_sprite is drawn behind the whole body, or just above the torso
+        when the torso metadata has weaponBackInFrontOfTorso set.
+        Only each layer's opaque box is blended; `layers` gives the (legs, torso, head, back weapon)
+        opaque_layers when they are already prepared, and empty layers are skipped.
+        """
         # The head sprite is 32x32 and needs to be centered on a 64x64 grid.
         # The offset from the XML is relative to the top-left of the torso sprite.
         # A (0,0) offset in the XML should place the head's center on the torso's center.
@@ -273,26 +742,68 @@ class Spritesheet:
         torso_offset = (torso_metadata_offset.x, -torso_metadata_offset.y)
         head_offset = (HEAD_CENTER_OFFSET + head_metadata_offset.x + torso_offset[0], HEAD_CENTER_OFFSET - head_metadata_offset.y + torso_offset[1])
 
+        # The weapon's center sits at weaponBackPosition from the torso's center, y up like headOffset.
+        weapon_offset = (0, 0)
+        if back_weapon_sprite is not None:
+            weapon_position = torso_metadata.weapon_back_position
+            weapon_offset = (torso_offset[0] + torso_sprite.width // 2 + weapon_position.x - back_weapon_sprite.width // 2,
+                             torso_offset[1] + torso_sprite.height // 2 - weapon_position.y - back_weapon_sprite.height // 2)
+
         # Calculate the required dimensions for the final composite image based on the
         # largest dimensions of the combined parts and their offsets.
         composite_width = max(leg_sprite.width, torso_sprite.width, head_sprite.width + head_offset[0])
         composite_height = max(leg_sprite.height, torso_sprite.height, head_sprite.height + head_offset[1])
-
-        # Create a new transparent canvas of the calculated size.
-        composite_image = Image.new("RGBA", (composite_width, composite_height), (0, 0, 0, 0))
+        if back_weapon_sprite is not None:
+            composite_width = max(composite_width, back_weapon_sprite.width + weapon_offset[0])
+            composite_height = max(composite_height, back_weapon_sprite.height + weapon_offset[1])
+
+        # Create a new transparent canvas of the calculated size. If every layer is indexed
+        # against the shared palette, composite in index space; otherwise fall back to RGBA.
+        sprites = (leg_sprite, torso_sprite, head_sprite, back_weapon_sprite)
+        if all(sprite is None or sprite.mode == "P" for sprite in sprites):
+            # The shared palette is attached to one blank canvas per size, which is copied.
+            canvas_key = ((composite_width, composite_height), len(self.palette))
+            canvas = self._canvases.get(canvas_key)
+            if canvas is None:
+                canvas = Image.new("P", canvas_key[0], TRANSPARENT_INDEX)
+                canvas.putpalette(self.palette.flat())
+                canvas.info['transparency'] = TRANSPARENT_INDEX
+                self._canvases[canvas_key] = canvas
+            composite_image = canvas.copy()
+        else:
+            composite_image = Image.new("RGBA", (composite_width, composite_height), (0, 0, 0, 0))
+            if any(sprite is not None and sprite.mode != "RGBA" for sprite in sprites):
+                # Prepared indexed layers can't be pasted onto RGBA; rebuild them from converted sprites.
+                sprites = tuple(sprite if sprite is None or sprite.mode == "RGBA" else sprite.convert("RGBA") for sprite in sprites)
+                layers = None
+        if layers is None:
+            layers = tuple(opaque_layer(sprite, opaque_bbox(sprite)) if sprite is not None else None for sprite in sprites)
+        leg_layer, torso_layer, head_layer, weapon_layer = layers
+
+        # A back weapon behind the torso is behind the legs too.
+        if back_weapon_sprite is not None and not torso_metadata.weapon_back_in_front_of_torso:
+            paste_layer(composite_image, weapon_layer, weapon_offset)
 
         # Paste legs first, as they are always in the back.
-        composite_image.paste(leg_sprite, (0, 0), leg_sprite)
+        paste_layer(composite_image, leg_layer, (0, 0))
 
         # Paste head and torso based on the metadata flag, using each layer's alpha channel as a mask.
+        # A back weapon in front of the torso goes directly on top of it.
+        torso_layers = [(torso_layer, torso_offset)]
+        if back_weapon_sprite is not None and torso_metadata.weapon_back_in_front_of_torso:
+            torso_layers.append((weapon_layer, weapon_offset))
         if torso_metadata.head_in_front_of_torso:
-            composite_image.paste(torso_sprite, torso_offset, torso_sprite)
-            composite_image.paste(head_sprite, head_offset, head_sprite)
+            for layer, offset in torso_layers:
+                paste_layer(composite_image, layer, offset)
+            paste_layer(composite_image, head_layer, head_offset)
         else:
-            composite_image.paste(head_sprite, head_offset, head_sprite)
-            composite_image.paste(torso_sprite, torso_offset, torso_sprite)
+            paste_layer(composite_image, head_layer, head_offset)
+            for layer, offset in torso_layers:
+                paste_layer(composite_image, layer, offset)
         
         if show_indices:
+            # Text is drawn in RGBA so the label color doesn't need a palette slot.
+            composite_image = composite_image.convert("RGBA")
             # Draw the indices on the top-left corner
             draw = ImageDraw.Draw(composite_image)
             text = f"L:{leg_index}\nT:{torso_index}\nH:{head_index}"
@@ -305,6 +816,7 @@ class Spritesheet:
             
             draw.text((0, 0), text, fill=(0, 0, 0, 255), font=font)
 
+        profiling.count('composites')
         return composite_image
     
 
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import argparse
+import ast
+import json
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import indexes
+from indexes import (
+    Direction, get_head_indexes, get_leg_indexes, get_pistol_indexes, get_rifle_indexes,
+    get_shotgun_indexes, get_smg_indexes, get_unarmed_indexes,
+)
+from png_probe import read_png_header
+from skin_catalog import load_config, open_catalog
+
+# --- Configuration ---
+DEFAULT_JOBS = 16
+
+# Each body sheet, the metadata file describing it, and the index table that addresses both.
+SHEET_CHECKS = [
+    ('Legs.png', 'LegSpriteData.xml', get_leg_indexes),
+    ('Torso.png', 'TorsoSpriteData.xml', get_unarmed_indexes),
+    ('pistol.png', 'pistolSpriteData.xml', get_pistol_indexes),
+    ('smg.png', 'smgSpriteData.xml', get_smg_indexes),
+    ('rifle.png', 'rifleSpriteData.xml', get_rifle_indexes),
+    ('shotgun.png', 'shotgunSpriteData.xml', get_shotgun_indexes),
+]
+BODY_SPRITE_SIZE = (64, 64)
+HEAD_SPRITE_SIZE = (32, 32)
+METADATA_RECORD_TAGS = ('SpriteData', 'SpriteDataLegs')
+
+
+def index_table_animations():
+    """Collects every animation name the index tables compare against (`animation == '...'`) from indexes.py."""
+    tree = ast.parse(Path(indexes.__file__).read_text())
+    animations = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Compare) and isinstance(node.left, ast.Name) and node.left.id == 'animation':
+            animations.update(c.value for c in node.comparators if isinstance(c, ast.Constant) and isinstance(c.value, str))
+    return sorted(animations)
+
+
+def referenced_frames(index_func, animations):
+    """Returns {frame index: first (animation, direction) that references it} for one index table."""
+    frames = {}
+    for animation in animations:
+        for direction in Direction:
+            for frame in index_func(direction, animation) or []:
+                frames.setdefault(frame, (animation, direction.name))
+    return frames
+
+
+def count_metadata_records(path):
+    """Counts the SpriteData / SpriteDataLegs records of a metadata XML without keeping the tree."""
+    count = 0
+    for _, elem in ET.iterparse(path):
+        if elem.tag in METADATA_RECORD_TAGS:
+            count += 1
+            elem.clear()
+    return count
+
+
+def check_sheet(issues, path, sprite_size, frames, label, probe=read_png_header):
+    """Checks a sheet's grid and that it has a cell for every referenced frame. Returns the cell count, or None."""
+    if not path.is_file():
+        issues.append(issue('error', 'missing_file', path, f"{label} sheet is missing."))
+        return None
+    try:
+        header = probe(path)
+    except (OSError, ValueError) as e:
+        issues.append(issue('error', 'unreadable_png', path, str(e)))
+        return None
+
+    sprite_w, sprite_h = sprite_size
+    if header.width % sprite_w or header.height % sprite_h:
+        issues.append(issue('warning', 'cell_grid', path,
+                            f"Dimensions {header.width}x{header.height} are not a multiple of {sprite_w}x{sprite_h}."))
+    cells = -(-header.width // sprite_w) * -(-header.height // sprite_h)
+
+    missing = sorted(frame for frame in frames if frame >= cells)
+    if missing:
+        animation, direction = frames[missing[0]]
+        issues.append(issue('error', 'frame_out_of_range', path,
+                            f"Index tables reference frames {missing} but the sheet has {cells} cells "
+                            f"(first use: {animation} {direction}).", frames=missing, cells=cells))
+    return cells
+
+
+def check_metadata(issues, path, frames, cells):
+    """Checks that a metadata XML has a record for every referenced frame and matches its sheet's cell count."""
+    if not path.is_file():
+        issues.append(issue('error', 'missing_file', path, "Metadata file is missing."))
+        return
+    try:
+        records = count_metadata_records(path)
+    except ET.ParseError as e:
+        issues.append(issue('error', 'unparseable_xml', path, str(e)))
+        return
+
+    missing = sorted(frame for frame in frames if frame >= records)
+    if missing:
+        animation, direction = frames[missing[0]]
+        issues.append(issue('error', 'metadata_out_of_range', path,
+                            f"Index tables reference frames {missing} but the file has {records} records "
+                            f"(first use: {animation} {direction}).", frames=missing, records=records))
+    if cells is not None and records != cells:
+        issues.append(issue('warning', 'metadata_count_mismatch', path,
+                            f"{records} metadata records for a sheet with {cells} cells.", records=records, cells=cells))
+
+
+def issue(severity, check, path, message, **details):
+    return {'severity': severity, 'check': check, 'file': str(path), 'message': message, **details}
+
+
+def validate_skin(skin_dir, head_path, frame_tables, probe=read_png_header):
+    """Runs every check for one skin. Returns a list of issue dicts."""
+    issues = []
+    for (sheet_name, metadata_name, _), frames in zip(SHEET_CHECKS, frame_tables['body']):
+        cells = check_sheet(issues, skin_dir / sheet_name, BODY_SPRITE_SIZE, frames, sheet_name, probe)
+        check_metadata(issues, skin_dir / metadata_name, frames, cells)
+    if head_path.is_file():
+        check_sheet(issues, head_path, HEAD_SPRITE_SIZE, frame_tables['head'], 'Head', probe)
+    else:
+        issues.append(issue('warning', 'missing_file', head_path, "No head sheet with this skin's name."))
+    return issues
+
+
+def validate_library(skin_dirs, head_dir, jobs=DEFAULT_JOBS, probe=read_png_header):
+    """
+    Validates every skin in parallel. Returns a machine-readable report dict.
+    `probe` reads a sheet's PngHeader; pass SkinCatalog.header to reuse catalogued headers.
+    """
+    animations = index_table_animations()
+    frame_tables = {
+        'body': [referenced_frames(index_func, animations) for _, _, index_func in SHEET_CHECKS],
+        'head': {frame: ('head', direction.name) for direction in Direction for frame in get_head_indexes(direction) or []},
+    }
+    names = sorted(skin_dirs)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(lambda name: validate_skin(Path(skin_dirs[name]), Path(head_dir) / f'{name}.png', frame_tables, probe), names)
+        skins = {name: {'issues': issues} for name, issues in zip(names, results)}
+
+    all_issues = [i for skin in skins.values() for i in skin['issues']]
+    return {
+        'summary': {
+            'skins': len(skins),
+            'errors': sum(1 for i in all_issues if i['severity'] == 'error'),
+            'warnings': sum(1 for i in all_issues if i['severity'] == 'warning'),
+            'skins_with_errors': sorted(name for name, skin in skins.items() if any(i['severity'] == 'error' for i in skin['issues'])),
+        },
+        'skins': skins,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check sheet sizes, metadata record counts and index-table frames for every skin.")
+    parser.add_argument('--json', metavar='PATH', help="Write the report as JSON to PATH ('-' for stdout).")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help=f"Skins validated in parallel. Default is {DEFAULT_JOBS}.")
+    parser.add_argument('--strict', action='store_true', help="Exit non-zero on warnings as well as errors.")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not Path(config.spritesheet_directory).is_dir():
+        print(f"Error: The base spritesheet directory was not found at '{config.spritesheet_directory}'")
+        sys.exit(1)
+
+    catalog = open_catalog(config)
+    report = validate_library(catalog.skin_dirs(), catalog.head_dir, args.jobs, catalog.header)
+    catalog.save()
+
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    else:
+        for name, skin in report['skins'].items():
+            for i in skin['issues']:
+                print(f"{i['severity'].upper():<8} {name}: {Path(i['file']).name}: {i['message']}")
+        summary = report['summary']
+        print(f"\nValidated {summary['skins']} skins: {summary['errors']} errors, {summary['warnings']} warnings.")
+        if args.json:
+            Path(args.json).write_text(json.dumps(report, indent=2))
+            print(f"Saved report to '{args.json}'")
+
+    summary = report['summary']
+    if summary['errors'] or (args.strict and summary['warnings']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()